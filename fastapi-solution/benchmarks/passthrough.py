@@ -0,0 +1,114 @@
+"""Процессорное время на ответ GET /api/v1/films/{film_id}.
+
+Сравнивает сборку ответа через модели с отдачей JSON записи как есть:
+при попадании в кеш и при промахе (документ из _source).
+Запуск из fastapi-solution: python -m benchmarks.passthrough
+"""
+import asyncio
+import time
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.routing import serialize_response
+
+from src.api.v1 import films
+from src.services.cache import CacheEntry, RawEntity
+from src.services.film import FilmService
+
+N = 20000
+FIELDS = tuple(FilmService.model.__fields__)
+SOURCE = {
+    'id': 'c4f5a2d2-1f0e-4b4f-9d7e-3d2c8b1e6a01',
+    'title': 'Star Wars: Episode IV - A New Hope',
+    'description': 'The Imperial Forces, under orders from cruel Darth Vader, '
+                   'hold Princess Leia hostage in their efforts to quell '
+                   'the rebellion against the Galactic Empire.',
+    'created': '1977-05-25T00:00:00',
+    'age_limit': 12,
+    'type': 'movie',
+    'imdb_rating': 8.6,
+    'genre': ['Action', 'Adventure', 'Fantasy', 'Sci-Fi'],
+    'director': ['George Lucas'],
+    'actors': [
+        {'id': f'actor-{i}', 'name': f'Actor {i}'} for i in range(10)
+    ],
+    'writers': [
+        {'id': f'writer-{i}', 'name': f'Writer {i}'} for i in range(3)
+    ],
+}
+
+
+def _response_field():
+    for route in films.router.routes:
+        if route.path == '/{film_id}':
+            return route.secure_cloned_response_field
+
+
+async def model_hit(data: bytes, field) -> bytes:
+    """Как до сквозной отдачи: запись -> модель -> модель ответа -> JSON"""
+    entry = CacheEntry.decode(data, load=FilmService.model.parse_obj)
+    content = await serialize_response(
+        field=field,
+        response_content=films.Film(**entry.value.dict()),
+        exclude_unset=True,
+    )
+    return ORJSONResponse(content).body
+
+
+async def raw_hit(data: bytes, field) -> bytes:
+    entry = CacheEntry.decode_raw(data, SOURCE['id'])
+    return Response(entry.value.json, media_type='application/json').body
+
+
+async def model_miss(data: bytes, field) -> bytes:
+    film = FilmService.model(**SOURCE)
+    CacheEntry.create(film, 300, 0.01).encode()
+    content = await serialize_response(
+        field=field,
+        response_content=films.Film(**film.dict()),
+        exclude_unset=True,
+    )
+    return ORJSONResponse(content).body
+
+
+async def raw_miss(data: bytes, field) -> bytes:
+    entity = RawEntity(
+        SOURCE['id'],
+        orjson.dumps({name: SOURCE.get(name) for name in FIELDS})
+    )
+    CacheEntry.create(entity, 300, 0.01).encode()
+    return Response(entity.json, media_type='application/json').body
+
+
+async def measure(func, data: bytes, field) -> float:
+    """микросекунды процессорного времени на вызов"""
+    started = time.process_time()
+    for _ in range(N):
+        await func(data, field)
+    return (time.process_time() - started) / N * 1e6
+
+
+async def main() -> None:
+    field = _response_field()
+    data = CacheEntry.create(
+        FilmService.model(**SOURCE), 300, 0.01
+    ).encode()
+    assert orjson.loads(await model_hit(data, field)) == orjson.loads(
+        await raw_hit(data, field)
+    )
+
+    for name, model_path, raw_path in (
+        ('cache hit', model_hit, raw_hit),
+        ('cache miss', model_miss, raw_miss),
+    ):
+        model_us = await measure(model_path, data, field)
+        raw_us = await measure(raw_path, data, field)
+        print(
+            f'{name:<10}  models {model_us:8.1f} us  '
+            f'passthrough {raw_us:8.1f} us  '
+            f'saved {model_us - raw_us:8.1f} us ({model_us / raw_us:.1f}x)'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
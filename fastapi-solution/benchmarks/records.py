@@ -0,0 +1,94 @@
+"""Время и память на страницу из 100 фильмов: модели pydantic и записи.
+
+Сборка страницы из _source, запись в кеш, чтение из кеша
+и сериализация ответа списка. Строка list — список по умолчанию
+(фильмы целиком), projection — список с fields=id,title,imdb_rating.
+Запуск из fastapi-solution: python -m benchmarks.records
+"""
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+from src.api.v1.films import FILM_DEFAULT_FIELDS, FILMS_DEFAULT_FIELDS
+from src.models.base_model import projection_model, record_model
+from src.models.film import Film
+from src.services.base import _load_search_result
+from src.services.cache import CacheEntry
+
+N = 300
+PAGE_SIZE = 100
+HITS = [
+    {
+        '_source': {
+            'id': f'film-{i}',
+            'title': f'Film {i}',
+            'description': 'Some description of the film',
+            'created': '1977-05-25T00:00:00',
+            'imdb_rating': i / 10,
+            'genre': ['Action', 'Sci-Fi'],
+            'director': ['George Lucas'],
+            'actors': [{'id': f'actor-{a}', 'name': f'Actor {a}'} for a in range(5)],
+            'writers': [{'id': 'writer-1', 'name': 'Writer'}],
+        }
+    }
+    for i in range(PAGE_SIZE)
+]
+
+
+def page(model) -> bytes:
+    """Путь страницы списка: эластик -> кеш -> ответ"""
+    result = {
+        'total': PAGE_SIZE,
+        'items': [model(**hit['_source']) for hit in HITS],
+        'after': None,
+    }
+    data = CacheEntry.create(result, 300, 0.01).encode()
+    entry = CacheEntry.decode(
+        data,
+        load=lambda value: _load_search_result(model, value)
+    )
+    return ORJSONResponse(
+        jsonable_encoder({'pagination': {}, 'result': entry.value['items']})
+    ).body
+
+
+def measure(model) -> tuple:
+    started = time.process_time()
+    for _ in range(N):
+        page(model)
+    ms = (time.process_time() - started) / N * 1e3
+
+    # пик памяти, выделенной за одну страницу
+    tracemalloc.start()
+    page(model)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ms, peak / 1024
+
+
+def main() -> None:
+    rows = (
+        ('list', FILMS_DEFAULT_FIELDS),
+        ('projection', FILM_DEFAULT_FIELDS),
+    )
+    for name, fields in rows:
+        pydantic_model = (
+            Film if fields is None else projection_model(Film, fields)
+        )
+        models = (
+            ('pydantic', pydantic_model),
+            ('record', record_model(Film, fields)),
+        )
+        assert page(models[0][1]) == page(models[1][1])
+        for kind, model in models:
+            ms, peak_kb = measure(model)
+            print(
+                f'{name:<10}  {kind:<8}  {ms:7.2f} ms/page  '
+                f'peak {peak_kb:8.1f} KiB'
+            )
+
+
+if __name__ == '__main__':
+    main()
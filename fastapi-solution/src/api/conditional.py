@@ -0,0 +1,43 @@
+from http import HTTPStatus
+
+from fastapi import Request, Response
+
+from src.core.config import cache_settings
+from src.services import etag
+
+# ответы зависят от токена пользователя, в общих кешах их хранить нельзя
+CACHE_CONTROL = (
+    'private, no-cache'
+    if cache_settings.http_max_age == 0
+    else f'private, max-age={cache_settings.http_max_age}'
+)
+
+
+async def conditional_get(request: Request, call_next) -> Response:
+    """ETag и Cache-Control для GET в /api, 304 при совпадении If-None-Match"""
+    if request.method != 'GET' or not request.url.path.startswith('/api/'):
+        return await call_next(request)
+
+    # кеш ответов мог уже начать сбор etag для этого запроса
+    state = etag.current() or etag.start(request.headers.get('if-none-match'))
+    response = await call_next(request)
+    if response.status_code != HTTPStatus.OK:
+        return response
+
+    response_etag = state.response_etag()
+    if response_etag is None:
+        return response
+
+    headers = {'ETag': response_etag, 'Cache-Control': CACHE_CONTROL}
+    if state.matches(response_etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return response
+
+
+async def not_modified(request: Request, exc: etag.NotModified) -> Response:
+    return Response(
+        status_code=HTTPStatus.NOT_MODIFIED,
+        headers={'ETag': exc.etag, 'Cache-Control': CACHE_CONTROL}
+    )
@@ -0,0 +1,52 @@
+from http import HTTPStatus
+from typing import List
+
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+
+from src import warmup
+from src.core import metrics
+from src.services import invalidation
+
+router = APIRouter()
+
+
+class CacheInvalidation(BaseModel):
+    index: str = Field(..., regex='^(movies|person|genres)$')
+    ids: List[str] = []
+    # сбросить все страницы поиска, если сущности добавлены или удалены
+    lists: bool = False
+
+
+@router.get('/stats', include_in_schema=False)
+async def get_stats() -> dict:
+    """Счётчики кешей и соединений текущего воркера"""
+    return metrics.collect()
+
+
+@router.get('/ready', include_in_schema=False)
+async def get_ready() -> ORJSONResponse:
+    """Воркер готов, когда закончен прогрев кеша.
+
+    Отвечает тот воркер gunicorn, которому достался запрос: проба
+    считает сервис готовым после нескольких успешных ответов подряд,
+    см. healthcheck в docker-compose.yaml.
+    """
+    if not warmup.is_ready():
+        return ORJSONResponse(
+            {'ready': False},
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE
+        )
+    return ORJSONResponse({'ready': True})
+
+
+@router.post('/cache/invalidate', include_in_schema=False)
+async def invalidate_cache(changes: CacheInvalidation) -> dict:
+    """Удаляет записи кеша с изменёнными сущностями во всех воркерах"""
+    keys = await invalidation.cache_invalidator.invalidate(
+        changes.index,
+        changes.ids,
+        changes.lists
+    )
+    return {'invalidated': keys}
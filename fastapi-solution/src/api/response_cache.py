@@ -0,0 +1,223 @@
+import re
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+import orjson
+from fastapi import HTTPException, Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src import auth
+from src.db.async_cache_storage import AsyncCacheStorage
+from src.services import etag
+from src.services.cache import build_response_key
+
+# виды эндпоинтов, для каждого своё время жизни ответа
+ROUTES: Tuple[Tuple[str, re.Pattern], ...] = (
+    ('search', re.compile(
+        r'^/api/v1/(films|persons|genres)/(search|suggest|facets)/$'
+    )),
+    ('list', re.compile(r'^/api/v1/(films|persons|genres)/$')),
+    ('detail', re.compile(r'^/api/v1/(films|persons|genres)/[^/]+(/films)?$')),
+)
+# страницы снимка индекса привязаны к PIT, хранить их нет смысла
+BYPASS_PARAMS = ('page[snapshot]',)
+STORED_HEADERS = (b'content-type', b'etag', b'cache-control')
+
+
+class ResponseCache:
+    """Готовые ответы GET целиком: заголовки и тело.
+
+    Ответ сохраняется, только если весь собран из записей кеша,
+    и помечается их тегами, так что инвалидация удаляет и его.
+    От пользователя ответ не зависит, но токен проверяется
+    перед каждой отдачей из кеша.
+    """
+
+    def __init__(
+        self,
+        cache: AsyncCacheStorage,
+        expire: Dict[str, int],
+        max_bytes: int,
+        tag_expire: int,
+    ) -> None:
+        self._cache = cache
+        self._expire = expire
+        self._max_bytes = max_bytes
+        # теги общие с записями сервисов, сокращать их жизнь нельзя
+        self._tag_expire = tag_expire
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypasses = 0
+        self.not_modified = 0
+
+    def expire_for(self, path: str) -> int:
+        for kind, pattern in ROUTES:
+            if pattern.match(path):
+                return self._expire.get(kind, 0)
+        return 0
+
+    def key(self, scope: Scope) -> str:
+        query = parse_qsl(
+            scope['query_string'].decode('latin-1'),
+            keep_blank_values=True
+        )
+        return build_response_key(scope['path'], urlencode(sorted(query)))
+
+    async def get(self, key: str) -> Optional[Tuple[List[list], bytes]]:
+        data = await self._cache.get(key)
+        if data is None:
+            return None
+        header, body = data.split(b'\n', 1)
+        return orjson.loads(header), body
+
+    async def set(
+        self,
+        key: str,
+        headers: List[Tuple[bytes, bytes]],
+        body: bytes,
+        tags: List[str],
+        expire: int,
+    ) -> None:
+        if len(body) > self._max_bytes:
+            return
+        header = orjson.dumps([
+            [name.decode('latin-1'), value.decode('latin-1')]
+            for name, value in headers
+            if name.lower() in STORED_HEADERS
+        ])
+        # orjson экранирует переводы строк, первый из них - конец заголовков
+        await self._cache.set_tagged(
+            {key: header + b'\n' + body},
+            {tag: [key] for tag in tags},
+            expire=expire,
+            tag_expire=self._tag_expire
+        )
+        self.stores += 1
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'bypasses': self.bypasses,
+            'not_modified': self.not_modified,
+        }
+
+
+response_cache: Optional[ResponseCache] = None
+
+
+class ResponseCacheMiddleware:
+    """Отдаёт сохранённые ответы, не доходя до эндпоинтов и сервисов"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        cache = response_cache
+        if cache is None or scope['type'] != 'http' or scope['method'] != 'GET':
+            await self.app(scope, receive, send)
+            return
+
+        expire = cache.expire_for(scope['path'])
+        if not expire:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        if any(param in request.query_params for param in BYPASS_PARAMS):
+            cache.bypasses += 1
+            await self.app(scope, receive, send)
+            return
+
+        # без токена эндпоинт ответит 401 сам
+        if not await _authorized(request):
+            await self.app(scope, receive, send)
+            return
+
+        key = cache.key(scope)
+        if_none_match = request.headers.get('if-none-match')
+        cache_control = request.headers.get('cache-control', '')
+        if 'no-cache' not in cache_control and 'no-store' not in cache_control:
+            cached = await cache.get(key)
+            if cached is not None:
+                cache.hits += 1
+                await self._send_cached(cache, cached, if_none_match, send)
+                return
+
+        cache.misses += 1
+        state = etag.start(if_none_match, collect_tags=True)
+        status = None
+        headers: List[Tuple[bytes, bytes]] = []
+        body: List[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal status, headers
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = message.get('headers', [])
+            elif message['type'] == 'http.response.body':
+                body.append(message.get('body', b''))
+            await send(message)
+
+        await self.app(scope, receive, capture)
+
+        if (
+            status == HTTPStatus.OK
+            and state.etags
+            and state.tags
+            and 'no-store' not in cache_control
+        ):
+            await cache.set(key, headers, b''.join(body), list(state.tags), expire)
+
+    async def _send_cached(
+        self,
+        cache: ResponseCache,
+        cached: Tuple[List[list], bytes],
+        if_none_match: Optional[str],
+        send: Send,
+    ) -> None:
+        stored_headers, body = cached
+        headers = [
+            (name.encode('latin-1'), value.encode('latin-1'))
+            for name, value in stored_headers
+        ]
+        headers.append((b'x-cache', b'hit'))
+        response_etag = next(
+            (value for name, value in stored_headers if name == 'etag'),
+            None
+        )
+        state = etag.RequestETags(if_none_match)
+        if response_etag is not None and state.matches(response_etag):
+            cache.not_modified += 1
+            await send({
+                'type': 'http.response.start',
+                'status': HTTPStatus.NOT_MODIFIED,
+                'headers': [
+                    header for header in headers
+                    if header[0] != b'content-type'
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        headers.append((b'content-length', str(len(body)).encode()))
+        await send({
+            'type': 'http.response.start',
+            'status': HTTPStatus.OK,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+async def _authorized(request: Request) -> bool:
+    try:
+        return await auth.token_verifier.verify(
+            request.cookies.get('access_token_cookie'),
+            request.cookies.get('refresh_token_cookie')
+        )
+    except HTTPException:
+        # сервис авторизации недоступен, ошибку вернёт эндпоинт
+        return False
@@ -1,22 +1,52 @@
+from datetime import datetime
 from http import HTTPStatus
 from fastapi import Query
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from pydantic import BaseModel
-from pydantic.schema import List, Dict
+from pydantic.schema import List, Dict, Optional
 
 from src.services.film import FilmService, get_film_service
+from src.services.loader import EntityLoader, expand_refs
+from src.services.person import PersonService, get_person_service
+from src.services.suggest import SuggestService, get_film_suggest_service
 from src.core.constants import NOT_FOUND_MESS
-from src.services.utils import pagination
+from src.services.utils import (
+    BatchIds,
+    cursor_pagination_query,
+    expand_query,
+    fields_query,
+    pagination,
+    with_fields,
+)
 from src.auth import token_verification
 
 router = APIRouter()
 
+FILM_DEFAULT_FIELDS = ('id', 'title', 'imdb_rating')
+film_fields = fields_query(FilmService.model, FILM_DEFAULT_FIELDS)
+# списки и поиск отдают фильмы целиком, fields= только сужает их
+FILMS_DEFAULT_FIELDS = None
+films_fields = fields_query(FilmService.model, FILMS_DEFAULT_FIELDS)
+# ссылки на персон, которые можно раскрыть целиком
+FILM_EXPAND_FIELDS = ('actors', 'writers')
+film_expand = expand_query(FILM_EXPAND_FIELDS)
+FILM_SORT_FIELDS = ('imdb_rating', 'title')
+film_pagination = cursor_pagination_query(FILM_SORT_FIELDS)
+
 
 class Film(BaseModel):
     id: str
-    title: str
-    imdb_rating: float = 0
+    title: Optional[str]
+    description: Optional[str]
+    created: Optional[datetime]
+    age_limit: Optional[int]
+    type: Optional[str]
+    imdb_rating: Optional[float]
+    genre: Optional[list]
+    director: Optional[list]
+    actors: Optional[list]
+    writers: Optional[list]
 
 
 class Films(BaseModel):
@@ -24,21 +54,97 @@ class Films(BaseModel):
     result: List
 
 
-@router.get('/{film_id}', response_model=Film)
+class FilmsBatch(BaseModel):
+    result: List[Optional[Film]]
+    not_found: List[str]
+
+
+async def films_to_dicts(
+    films: list,
+    expand: tuple,
+    person_service: PersonService,
+) -> list:
+    """Фильмы как dict с раскрытыми ссылками на персон"""
+    films = [film.dict() if film else None for film in films]
+    if expand:
+        await expand_refs(
+            [film for film in films if film],
+            expand,
+            EntityLoader(person_service)
+        )
+    return films
+
+
+@router.get(
+    '/{film_id}',
+    response_model=Film,
+    response_model_exclude_unset=True
+)
 @token_verification
 async def get_movie_by_id(
                         film_id, 
                         film_service: FilmService = Depends(get_film_service),
+                        person_service: PersonService = Depends(get_person_service),
+                        fields: tuple = Depends(film_fields),
+                        expand: tuple = Depends(film_expand),
                         ):
-    """## Get movie title and imdb_rating by id"""
-    film = await film_service.get_by_id(film_id)
+    """
+    ## Get movie title and imdb_rating by id
+    ### **expand**: "actors,writers" - return persons instead of {id, name}
+    """
+    if not expand:
+        # без раскрытия ссылок JSON из кеша отдаётся как есть
+        film = await film_service.get_raw_by_id(film_id, fields)
+        if not film:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail=f'film {NOT_FOUND_MESS}'
+            )
+        return Response(film, media_type='application/json')
+
+    film = await film_service.get_by_id(
+        film_id, with_fields(FilmService.model, fields, expand)
+    )
     if not film:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail=f'film {NOT_FOUND_MESS}'
         )
 
-    return Film(**film.dict())
+    [film] = await films_to_dicts([film], expand, person_service)
+    return Film(**film)
+
+
+@router.post(
+    '/batch',
+    response_model=FilmsBatch,
+    response_model_exclude_unset=True
+)
+@token_verification
+async def get_movies_by_ids(
+    batch: BatchIds,
+    film_service: FilmService = Depends(get_film_service),
+    person_service: PersonService = Depends(get_person_service),
+    fields: tuple = Depends(film_fields),
+    expand: tuple = Depends(film_expand),
+) -> FilmsBatch:
+    """
+    ## Get movies by list of ids
+    ### Films are returned in the order of ids, null for ids which are not found
+    """
+    films = await film_service.get_by_ids(
+        batch.ids, with_fields(FilmService.model, fields, expand)
+    )
+
+    return FilmsBatch(
+        result=[
+            Film(**film) if film else None
+            for film in await films_to_dicts(films, expand, person_service)
+        ],
+        not_found=[
+            film_id for film_id, film in zip(batch.ids, films) if not film
+        ]
+    )
 
 
 @router.get('/search/')
@@ -46,15 +152,56 @@ async def get_movie_by_id(
 async def search_movie_by_word(
                             search_word: str,
                             film_service: FilmService = Depends(get_film_service),
-                            pagination: dict = Depends(pagination)
+                            person_service: PersonService = Depends(get_person_service),
+                            pagination: dict = Depends(pagination),
+                            fields: tuple = Depends(films_fields),
+                            expand: tuple = Depends(film_expand),
 
 ) -> Films:
     """## Search by the word in the title"""
     films = await film_service.get_by_search_word(
-        search_word, **pagination
+        search_word,
+        fields=with_fields(FilmService.model, fields, expand),
+        **pagination
+    )
+
+    return Films(
+        pagination=films['pagination'],
+        result=await films_to_dicts(films['result'], expand, person_service)
     )
 
-    return Films(pagination=films['pagination'], result=films['result'])
+
+@router.get('/suggest/')
+@token_verification
+async def suggest_movies(
+    prefix: str = Query(..., max_length=100),
+    limit: int = Query(default=10, ge=1, le=20),
+    suggest_service: SuggestService = Depends(get_film_suggest_service),
+) -> List[dict]:
+    """
+    ## Film titles for search-as-you-type: only id and title
+    ### **prefix**: text typed so far, the last word may be incomplete
+    """
+    return await suggest_service.suggest(prefix, limit)
+
+
+@router.get('/facets/')
+@token_verification
+async def get_movie_facets(
+    genre: Optional[str] = Query(
+        None,
+        description='Comma separated genres, films must have all of them'
+    ),
+    min_rating: Optional[float] = Query(None, ge=0, le=10),
+    film_service: FilmService = Depends(get_film_service),
+) -> dict:
+    """
+    ## Film counts by genre, imdb_rating band and age_limit for filters
+    ### **genre**: "Action,Comedy" - count only films with all of these genres
+    ### **min_rating**: count only films with imdb_rating not lower
+    """
+    genres = [name.strip() for name in (genre or '').split(',') if name.strip()]
+    return await film_service.get_facets(genres, min_rating)
 
 
 @router.get('/')
@@ -65,13 +212,23 @@ async def get_all_movies(
         regex='^-?(imdb_rating|title)',
         description='You can use only: imdb_rating, -imdb_rating'),
         film_service: FilmService = Depends(get_film_service),
-        pagination: dict = Depends(pagination)
+        person_service: PersonService = Depends(get_person_service),
+        pagination: dict = Depends(film_pagination),
+        fields: tuple = Depends(films_fields),
+        expand: tuple = Depends(film_expand),
 ) -> Films:
     """
     ## Get all movies
     ### **sort**: "-imdb_rating" - show worst first, "imdb_rating" - show best first, 
+    ### **page[cursor]**: pagination.next_cursor from the previous page, use it for deep pages
+    ### **page[snapshot]**: page through a frozen snapshot, pages do not shift while the index is updated
     """
     films = await film_service.get_films(
-        order_by=sort, **pagination
+        order_by=sort,
+        fields=with_fields(FilmService.model, fields, expand),
+        **pagination
+    )
+    return Films(
+        pagination=films['pagination'],
+        result=await films_to_dicts(films['result'], expand, person_service)
     )
-    return Films(pagination=films['pagination'], result=films['result'])
@@ -1,20 +1,30 @@
 from http import HTTPStatus
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 
 from src.services.genre import GenersService, get_genre_service
 from src.core.constants import NOT_FOUND_MESS
-from src.services.utils import pagination
+from src.services.utils import (
+    BatchIds, cursor_pagination_query, fields_query, pagination
+)
 from src.auth import token_verification
 
 
 router = APIRouter()
 
+GENRE_DEFAULT_FIELDS = ('id', 'title')
+GENRES_DEFAULT_FIELDS = ('id', 'title', 'imdb_rating')
+genre_fields = fields_query(GenersService.model, GENRE_DEFAULT_FIELDS)
+genres_fields = fields_query(GenersService.model, GENRES_DEFAULT_FIELDS)
+genre_pagination = cursor_pagination_query(('id',))
+
 
 class Genre(BaseModel):
     id: str
-    title: str
+    title: Optional[str]
+    imdb_rating: Optional[float]
 
 
 class Genres(BaseModel):
@@ -22,15 +32,25 @@ class Genres(BaseModel):
     result: list
 
 
+class GenresBatch(BaseModel):
+    result: List[Optional[Genre]]
+    not_found: List[str]
+
+
 @router.get('/', response_model=Genres)
 @token_verification
 async def get_all_genres(
     genre_service: GenersService = Depends(get_genre_service),
-    pagination: dict = Depends(pagination)
+    pagination: dict = Depends(genre_pagination),
+    fields: tuple = Depends(genres_fields),
 
 ) -> Genres:
-    """## List all genres"""
-    genres = await genre_service.get_genres(**pagination)
+    """
+    ## List all genres
+    ### **page[cursor]**: pagination.next_cursor from the previous page, use it for deep pages
+    ### **page[snapshot]**: page through a frozen snapshot, pages do not shift while the index is updated
+    """
+    genres = await genre_service.get_genres(fields=fields, **pagination)
     if not genres:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
@@ -43,14 +63,19 @@ async def get_all_genres(
     )
 
 
-@router.get('/{genre_id}', response_model=Genre)   
+@router.get(
+    '/{genre_id}',
+    response_model=Genre,
+    response_model_exclude_unset=True
+)
 @token_verification
 async def get_genre_by_id(
     genre_id: str,
-    genre_service: GenersService = Depends(get_genre_service)
+    genre_service: GenersService = Depends(get_genre_service),
+    fields: tuple = Depends(genre_fields),
 ):
     """## Get genre name by id"""
-    genre = await genre_service.get_by_id(genre_id)
+    genre = await genre_service.get_by_id(genre_id, fields)
     if not genre:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
@@ -60,16 +85,42 @@ async def get_genre_by_id(
     return Genre(**genre.dict())
 
 
+@router.post(
+    '/batch',
+    response_model=GenresBatch,
+    response_model_exclude_unset=True
+)
+@token_verification
+async def get_genres_by_ids(
+    batch: BatchIds,
+    genre_service: GenersService = Depends(get_genre_service),
+    fields: tuple = Depends(genre_fields),
+) -> GenresBatch:
+    """
+    ## Get genres by list of ids
+    ### Genres are returned in the order of ids, null for ids which are not found
+    """
+    genres = await genre_service.get_by_ids(batch.ids, fields)
+
+    return GenresBatch(
+        result=[Genre(**genre.dict()) if genre else None for genre in genres],
+        not_found=[
+            genre_id for genre_id, genre in zip(batch.ids, genres) if not genre
+        ]
+    )
+
+
 @router.get('/search/')
 @token_verification
 async def search_genre_by_word(
     search_word: str,
     genre_service: GenersService = Depends(get_genre_service),
-    pagination: dict = Depends(pagination)  
+    pagination: dict = Depends(pagination),
+    fields: tuple = Depends(genres_fields),
 ) -> Genres:
     """## Search genre by the word in the name"""
     genres = await genre_service.get_by_search_word(
-        search_word, **pagination
+        search_word, fields=fields, **pagination
     )
 
     return Genres(
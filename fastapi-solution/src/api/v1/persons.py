@@ -1,22 +1,34 @@
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 
+from src.api.v1.films import Film, films_fields
+from src.services.film import FilmService, get_film_service
+from src.services.loader import EntityLoader
 from src.services.person import PersonService, get_person_service
+from src.services.suggest import SuggestService, get_person_suggest_service
 from src.core.constants import NOT_FOUND_MESS
-from src.services.utils import pagination
+from src.services.utils import (
+    BatchIds, cursor_pagination_query, fields_query, pagination
+)
 from src.auth import token_verification
 
 
 router = APIRouter()
 
+PERSON_DEFAULT_FIELDS = ('id', 'name', 'role', 'film_ids')
+person_fields = fields_query(PersonService.model, PERSON_DEFAULT_FIELDS)
+person_pagination = cursor_pagination_query(('id',))
+
 
 class Person(BaseModel):
     id: str
-    name: str
-    role: str
-    film_ids: str
+    name: Optional[str]
+    role: Optional[str]
+    film_ids: Optional[str]
 
 
 class Persons(BaseModel):
@@ -24,21 +36,94 @@ class Persons(BaseModel):
     result: list
 
 
-@router.get('/{person_id}', response_model=Person)
+class PersonsBatch(BaseModel):
+    result: List[Optional[Person]]
+    not_found: List[str]
+
+
+@router.get(
+    '/{person_id}',
+    response_model=Person,
+    response_model_exclude_unset=True
+)
 @token_verification
 async def get_person_by_id(
     person_id: str,
-    person_service: PersonService = Depends(get_person_service)
+    person_service: PersonService = Depends(get_person_service),
+    fields: tuple = Depends(person_fields),
 ) -> Person:
     """## Get person name, role and film_ids by id"""
-    person = await person_service.get_by_id(person_id)
+    person = await person_service.get_raw_by_id(person_id, fields)
     if not person:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail=f'film {NOT_FOUND_MESS}'
         )
 
-    return Person(**person.dict())
+    # JSON из кеша отдаётся как есть, без моделей
+    return Response(person, media_type='application/json')
+
+
+@router.get(
+    '/{person_id}/films',
+    response_model=List[Film],
+    response_model_exclude_unset=True
+)
+@token_verification
+async def get_person_films(
+    person_id: str,
+    person_service: PersonService = Depends(get_person_service),
+    film_service: FilmService = Depends(get_film_service),
+    fields: tuple = Depends(films_fields),
+) -> List[Film]:
+    """
+    ## Get films of the person
+    ### **fields**: fields of the films
+    """
+    person = await person_service.get_by_id(person_id, ('id', 'film_ids'))
+    if not person:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail=f'person {NOT_FOUND_MESS}'
+        )
+
+    film_ids = [
+        film_id.strip()
+        for film_id in (person.film_ids or '').split(',')
+        if film_id.strip()
+    ]
+    films = await EntityLoader(film_service, fields).load_many(film_ids)
+
+    return [Film(**film.dict()) for film in films if film]
+
+
+@router.post(
+    '/batch',
+    response_model=PersonsBatch,
+    response_model_exclude_unset=True
+)
+@token_verification
+async def get_persons_by_ids(
+    batch: BatchIds,
+    person_service: PersonService = Depends(get_person_service),
+    fields: tuple = Depends(person_fields),
+) -> PersonsBatch:
+    """
+    ## Get persons by list of ids
+    ### Persons are returned in the order of ids, null for ids which are not found
+    """
+    persons = await person_service.get_by_ids(batch.ids, fields)
+
+    return PersonsBatch(
+        result=[
+            Person(**person.dict()) if person else None for person in persons
+        ],
+        not_found=[
+            person_id
+            for person_id, person in zip(batch.ids, persons)
+            if not person
+        ]
+    )
 
 
 @router.get('/search/')
@@ -47,10 +132,11 @@ async def search_person_by_word(
     search_word: str,
     pagination: dict = Depends(pagination),
     person_service: PersonService = Depends(get_person_service),
+    fields: tuple = Depends(person_fields),
 ) -> Persons:
     """## Search person by the word in name"""
     persons = await person_service.get_by_search_word(
-        search_word, **pagination
+        search_word, fields=fields, **pagination
     )
 
     return Persons(
@@ -59,19 +145,38 @@ async def search_person_by_word(
     )
 
 
+@router.get('/suggest/')
+@token_verification
+async def suggest_persons(
+    prefix: str = Query(..., max_length=100),
+    limit: int = Query(default=10, ge=1, le=20),
+    suggest_service: SuggestService = Depends(get_person_suggest_service),
+) -> List[dict]:
+    """
+    ## Person names for search-as-you-type: only id and name
+    ### **prefix**: text typed so far, the last word may be incomplete
+    """
+    return await suggest_service.suggest(prefix, limit)
+
+
 @router.get('/')
 @token_verification
 async def get_all_persons(
-    pagination: dict = Depends(pagination),
+    pagination: dict = Depends(person_pagination),
     sort: str = Query(
         default='id',
         regex='^-?(id)',
         description='You can use only: id, -id'),
     person_service: PersonService = Depends(get_person_service),
+    fields: tuple = Depends(person_fields),
 ) -> Persons:
-    """## List all persons"""
+    """
+    ## List all persons
+    ### **page[cursor]**: pagination.next_cursor from the previous page, use it for deep pages
+    ### **page[snapshot]**: page through a frozen snapshot, pages do not shift while the index is updated
+    """
     films = await person_service.get_persons(
-        order_by=sort, **pagination
+        order_by=sort, fields=fields, **pagination
     )
 
     return Persons(
@@ -1,14 +1,281 @@
-from fastapi import Cookie
-import requests
+import asyncio
+import hashlib
+import inspect
+import logging
+import time
+from collections import OrderedDict
+from functools import wraps
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import jwt
+from fastapi import Cookie, HTTPException
+
+from src.core import metrics
+from src.core.constants import AUTH_UNAVAILABLE_MESS, TOKEN_EXPIRED_MESS
+from src.core.singleflight import SingleFlight
+from src.db.async_cache_storage import AsyncCacheStorage
+
+logger = logging.getLogger(__name__)
+
+# сервис авторизации отверг токен
+REJECTED_STATUSES = (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN)
+
+
+class LocalTokenValidator:
+    """Локальная проверка подписи и claims JWT по публичным ключам"""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        algorithms: List[str],
+        jwks_url: Optional[str] = None,
+        jwks_path: Optional[str] = None,
+        public_key_path: Optional[str] = None,
+        refresh_interval: int = 300,
+        issuer: Optional[str] = None,
+        audience: Optional[str] = None,
+        leeway: int = 0,
+    ) -> None:
+        self._session = session
+        self._algorithms = algorithms
+        self._jwks_url = jwks_url
+        self._jwks_path = jwks_path
+        self._public_key_path = public_key_path
+        self._refresh_interval = refresh_interval
+        self._issuer = issuer
+        self._audience = audience
+        self._leeway = leeway
+        self._keys: Dict[Optional[str], Any] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def load(self) -> None:
+        keys = {}
+        if self._public_key_path:
+            with open(self._public_key_path) as key_file:
+                keys[None] = key_file.read()
+
+        jwks = None
+        if self._jwks_path:
+            with open(self._jwks_path) as jwks_file:
+                jwks = jwks_file.read()
+        elif self._jwks_url:
+            async with self._session.get(self._jwks_url) as resp:
+                resp.raise_for_status()
+                jwks = await resp.text()
+        if jwks:
+            for jwk in jwt.PyJWKSet.from_json(jwks).keys:
+                keys[jwk.key_id] = jwk.key
+
+        self._keys = keys
+
+    def start_refresh(self) -> None:
+        self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def close(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+
+    def validate(self, token: str) -> Optional[bool]:
+        """None - токен нельзя проверить локально"""
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.DecodeError:
+            return False
+
+        if header.get('alg') not in self._algorithms:
+            return None
+        key = self._get_key(header.get('kid'))
+        if key is None:
+            return None
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=self._algorithms,
+                issuer=self._issuer,
+                audience=self._audience,
+                leeway=self._leeway,
+                options={
+                    'require': ['exp', 'sub'],
+                    'verify_aud': self._audience is not None,
+                },
+            )
+        except jwt.InvalidTokenError:
+            return False
+
+        return claims.get('type', 'access') == 'access'
+
+    def _get_key(self, kid: Optional[str]) -> Any:
+        if kid in self._keys:
+            return self._keys[kid]
+        if kid is None and len(self._keys) == 1:
+            return next(iter(self._keys.values()))
+        return None
+
+    async def _refresh(self) -> None:
+        while True:
+            await asyncio.sleep(self._refresh_interval)
+            try:
+                await self.load()
+            except Exception:
+                # продолжаем работать со старыми ключами
+                logger.exception('public keys refresh failed')
+
+
+class TokenVerifier:
+    """Проверка токенов в сервисе авторизации с кешем подтверждённых токенов"""
+    VERIFIED_TOKEN_KEY_TEMPLATE = 'auth_verified_token_{0}'
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        cache: AsyncCacheStorage,
+        url: str,
+        cache_expire: int,
+        local_cache_size: int,
+        local_validator: Optional[LocalTokenValidator] = None,
+    ) -> None:
+        self._session = session
+        self._cache = cache
+        self._url = url
+        self._cache_expire = cache_expire
+        self._local_cache_size = local_cache_size
+        self._local_validator = local_validator
+        self._verified = OrderedDict()
+        self._flight = SingleFlight()
+        metrics.register('auth_singleflight', self._flight.stats)
+
+    async def verify(
+        self,
+        access_token: Optional[str],
+        refresh_token: Optional[str],
+    ) -> bool:
+        if not access_token:
+            return False
+
+        token_hash = hashlib.sha256(access_token.encode()).hexdigest()
+        if self._verified_in_memory(token_hash):
+            return True
+
+        if self._local_validator:
+            is_valid = self._local_validator.validate(access_token)
+            if is_valid is not None:
+                return is_valid
+
+        if await self._cache.get(
+            self.VERIFIED_TOKEN_KEY_TEMPLATE.format(token_hash)
+        ):
+            self._remember(token_hash)
+            return True
+
+        # одинаковые токены, пришедшие одновременно, ждут один запрос
+        return await self._flight.do(
+            token_hash,
+            lambda: self._verify_remote(
+                token_hash,
+                access_token,
+                refresh_token
+            )
+        )
+
+    async def close(self) -> None:
+        if self._local_validator:
+            await self._local_validator.close()
+        await self._session.close()
+
+    async def _verify_remote(
+        self,
+        token_hash: str,
+        access_token: str,
+        refresh_token: Optional[str],
+    ) -> bool:
+        cookies = dict(access_token_cookie=access_token)
+        if refresh_token:
+            cookies['refresh_token_cookie'] = refresh_token
+        try:
+            async with self._session.get(self._url, cookies=cookies) as resp:
+                if resp.status in REJECTED_STATUSES:
+                    return False
+                if resp.status != HTTPStatus.OK:
+                    # ошибка самого сервиса - не повод отказывать в доступе
+                    logger.error('auth service answered %s', resp.status)
+                    raise HTTPException(
+                        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                        detail=AUTH_UNAVAILABLE_MESS
+                    )
+                is_valid = bool(await resp.json(content_type=None))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            logger.exception('auth service request failed')
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail=AUTH_UNAVAILABLE_MESS
+            )
+
+        if is_valid:
+            self._remember(token_hash)
+            await self._cache.set(
+                self.VERIFIED_TOKEN_KEY_TEMPLATE.format(token_hash),
+                '1',
+                expire=self._cache_expire
+            )
+        return is_valid
+
+    def _verified_in_memory(self, token_hash: str) -> bool:
+        expire_at = self._verified.get(token_hash)
+        if expire_at is None:
+            return False
+        if expire_at < time.monotonic():
+            del self._verified[token_hash]
+            return False
+        return True
+
+    def _remember(self, token_hash: str) -> None:
+        self._verified[token_hash] = time.monotonic() + self._cache_expire
+        self._verified.move_to_end(token_hash)
+        while len(self._verified) > self._local_cache_size:
+            self._verified.popitem(last=False)
+
+
+token_verifier: Optional[TokenVerifier] = None
 
-URL_SERVISE_AUTH = 'http://192.168.14.88:4242//api/v1/users/verify_token'
 
 def token_verification(func):
-    def wrapper(access_token_cookie = Cookie(), refresh_token_cookie = Cookie()):
-        cookies  = dict(access_token_cookie = access_token_cookie,
-                        refresh_token_cookie = refresh_token_cookie)
-        resp = requests.get(URL_SERVISE_AUTH, cookies=cookies)
-        if not resp.json():
-            return {'error':'Token expired'}
-        return func()
-    return wrapper
\ No newline at end of file
+    """Добавляет к эндпоинту проверку cookie с токенами"""
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    async def wrapper(
+        *args,
+        access_token_cookie: Optional[str] = None,
+        refresh_token_cookie: Optional[str] = None,
+        **kwargs
+    ):
+        if not await token_verifier.verify(
+            access_token_cookie,
+            refresh_token_cookie
+        ):
+            raise HTTPException(
+                status_code=HTTPStatus.UNAUTHORIZED,
+                detail=TOKEN_EXPIRED_MESS
+            )
+        return await func(*args, **kwargs)
+
+    wrapper.__signature__ = signature.replace(parameters=[
+        *signature.parameters.values(),
+        inspect.Parameter(
+            'access_token_cookie',
+            inspect.Parameter.KEYWORD_ONLY,
+            default=Cookie(None),
+            annotation=Optional[str],
+        ),
+        inspect.Parameter(
+            'refresh_token_cookie',
+            inspect.Parameter.KEYWORD_ONLY,
+            default=Cookie(None),
+            annotation=Optional[str],
+        ),
+    ])
+    return wrapper
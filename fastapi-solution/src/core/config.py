@@ -1,9 +1,11 @@
 import os
 from logging import config as logging_config
+from typing import List, Optional
 
 from dotenv import load_dotenv
-from pydantic import BaseSettings
+from pydantic import BaseSettings, Field
 
+from src.core.constants import URL_SERVISE_AUTH
 from src.core.logger import LOGGING
 
 load_dotenv()
@@ -17,6 +19,13 @@ class RedisSettings(BaseSettings):
     password: str
     host: str
     port: int
+    pool_minsize: int = 10
+    pool_maxsize: int = 20
+    # время на установку соединения, None - без ограничения
+    connect_timeout: Optional[float] = None
+    # GET одного тика - одним MGET, записи - тем же пайплайном
+    auto_pipeline: bool = False
+    pipeline_max_batch: int = 500
 
     class Config:
         env_file = ".env"
@@ -27,8 +36,137 @@ class RedisSettings(BaseSettings):
 class ElasticSearchSettings(BaseSettings):
     host: str
     port: str
+    # соединений на узел в каждом воркере
+    pool_maxsize: int = 10
+    timeout: float = 10.0
+    max_retries: int = 3
+    retry_on_timeout: bool = False
+    keepalive_timeout: float = 15.0
+    # окно сбора поисков в один _msearch, 0 - без объединения
+    batch_window_ms: float = 0
+    batch_max_size: int = 50
 
     class Config:
         env_file = ".env"
         env_file_encoding = 'utf-8'
         env_prefix = "elastic_"
+
+
+class AuthSettings(BaseSettings):
+    url: str = URL_SERVISE_AUTH
+    timeout: float = 2.0
+    pool_size: int = 100
+    cache_expire: int = 30
+    local_cache_size: int = 10000
+    # remote - каждый токен проверяется в сервисе авторизации,
+    # local - по публичным ключам, сервис авторизации как запасной вариант
+    verify_mode: str = Field('remote', regex='^(remote|local)$')
+    jwks_url: Optional[str] = None
+    jwks_path: Optional[str] = None
+    public_key_path: Optional[str] = None
+    jwks_refresh_interval: int = 300
+    algorithms: List[str] = ['RS256']
+    issuer: Optional[str] = None
+    audience: Optional[str] = None
+    leeway: int = 0
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = 'utf-8'
+        env_prefix = "auth_"
+
+
+class CacheSettings(BaseSettings):
+    local_enabled: bool = False
+    local_max_entries: int = 1000
+    local_max_bytes: int = 32 * 1024 * 1024
+    # expire - сколько запись считается свежей,
+    # stale - сколько после этого её ещё можно отдавать, обновляя в фоне
+    film_expire: int = 60 * 5
+    film_stale: int = 60
+    person_expire: int = 60 * 5
+    person_stale: int = 60
+    genre_expire: int = 60 * 5
+    genre_stale: int = 60
+    # жанры целиком в памяти воркера, перечитываются раз в genre_catalog_refresh
+    genre_catalog_enabled: bool = True
+    genre_catalog_refresh: int = 60
+    genre_catalog_max_size: int = 1000
+    # чем больше, тем раньше до истечения свежести начинается обновление
+    early_refresh_beta: float = 1.0
+    # точное число документов для списков всего индекса
+    index_total_expire: int = 60 * 30
+    # фасеты фильмов, обновляются в фоне после этого срока
+    facets_expire: int = 60 * 10
+    # max-age в Cache-Control ответов, 0 - клиент проверяет ETag каждый раз
+    http_max_age: int = 0
+    # готовые ответы целиком, время жизни по видам эндпоинтов, 0 - не хранить
+    response_enabled: bool = True
+    response_list_expire: int = 30
+    response_search_expire: int = 30
+    response_detail_expire: int = 0
+    response_max_bytes: int = 256 * 1024
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = 'utf-8'
+        env_prefix = "cache_"
+
+
+cache_settings = CacheSettings()
+
+
+class SearchSettings(BaseSettings):
+    # сколько живёт снимок индекса (PIT) без запросов к нему
+    snapshot_keep_alive: str = Field('1m', regex=r'^\d+(ms|s|m|h|d)$')
+    # документы индексирует ETL по схеме моделей, _source отдаётся без проверки
+    trusted_source: bool = True
+    # сущности как модели pydantic с проверкой типов, а не записи без неё
+    strict_models: bool = False
+    # до скольки эластик точно считает найденное, дальше total - нижняя граница
+    total_hits_threshold: int = 1000
+    # keyword-поле жанров для фасетов, в индексе без схемы - genre.keyword
+    facets_genre_field: str = 'genre'
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = 'utf-8'
+        env_prefix = "search_"
+
+
+search_settings = SearchSettings()
+
+
+class SuggestSettings(BaseSettings):
+    # поля для подсказок: text или search_as_you_type / edge-ngram из ETL
+    film_field: str = 'title'
+    person_field: str = 'name'
+    min_length: int = 2
+    # сколько совпадений префикса хранить, из полного списка
+    # подсказки для более длинных префиксов отбираются без эластика
+    pool_size: int = 100
+    expire: int = 60 * 5
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = 'utf-8'
+        env_prefix = "suggest_"
+
+
+suggest_settings = SuggestSettings()
+
+
+class WarmUpSettings(BaseSettings):
+    enabled: bool = True
+    # первые страницы списков для каждой сортировки
+    pages: int = 3
+    page_size: int = 10
+    concurrency: int = 4
+    # популярные id, JSON-список в переменной окружения
+    film_ids: List[str] = []
+    person_ids: List[str] = []
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = 'utf-8'
+        env_prefix = "warmup_"
@@ -1 +1,6 @@
 NOT_FOUND_MESS = 'not found'
+TOKEN_EXPIRED_MESS = 'Token expired'
+AUTH_UNAVAILABLE_MESS = 'Auth service unavailable'
+INVALID_CURSOR_MESS = 'invalid cursor'
+
+URL_SERVISE_AUTH = 'http://192.168.14.88:4242//api/v1/users/verify_token'
@@ -0,0 +1,35 @@
+from typing import Callable, Dict
+
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, collector: Callable[[], dict]) -> None:
+    """Регистрирует источник счётчиков для /internal/stats"""
+    _collectors[name] = collector
+
+
+def collect() -> dict:
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+class WaitTimer:
+    """Ожидания свободного соединения пула: число и время"""
+
+    __slots__ = ('waits', 'total', 'longest')
+
+    def __init__(self) -> None:
+        self.waits = 0
+        self.total = 0.0
+        self.longest = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.waits += 1
+        self.total += seconds
+        self.longest = max(self.longest, seconds)
+
+    def stats(self) -> dict:
+        return {
+            'waits': self.waits,
+            'wait_avg_ms': self.total / self.waits * 1e3 if self.waits else 0.0,
+            'wait_max_ms': self.longest * 1e3,
+        }
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Одновременные вызовы с одинаковым ключом ждут один общий вызов"""
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        # отмена одного из ожидающих не должна отменять общий вызов
+        return await asyncio.shield(self.start(key, func))
+
+    def start(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+    ) -> asyncio.Future:
+        """Запускает вызов или возвращает уже идущий, не дожидаясь его"""
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return future
+
+        self.calls += 1
+        future = asyncio.ensure_future(func())
+        self._calls[key] = future
+        future.add_done_callback(
+            lambda done: self._forget(key, done)
+        )
+        return future
+
+    def running(self, key: str) -> bool:
+        return key in self._calls
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls),
+        }
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # исключение уже получили ожидающие, здесь только помечаем его
+            future.exception()
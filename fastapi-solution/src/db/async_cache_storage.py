@@ -1,7 +1,13 @@
-from typing import Optional
-from aioredis import Redis
+import time
+from typing import (
+    Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+)
+from aioredis import ConnectionsPool, Redis
+from aioredis.commands import Pipeline
 from abc import abstractmethod, ABC
 
+from src.core.metrics import WaitTimer
+
 
 class AsyncCacheStorage(ABC):
     @abstractmethod
@@ -22,6 +28,46 @@ class AsyncCacheStorage(ABC):
     ) -> None:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def set_tagged(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        tags: Dict[str, List[str]],
+        expire: int,
+        tag_expire: Optional[int] = None,
+        **kwargs
+    ) -> None:
+        """items и теги к ним: тег - множество ключей, которые он помечает.
+
+        tag_expire - время жизни тегов, если ими помечены и более
+        долгие записи.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def pop_tagged(
+        self,
+        tags: List[str],
+        **kwargs
+    ) -> List[str]:
+        """удаляет ключи с тегами tags вместе с тегами, возвращает ключи"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def publish(
+        self,
+        channel: str,
+        message: Union[str, bytes],
+    ) -> int:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def listen(
+        self,
+        channel: str,
+    ) -> AsyncIterator[bytes]:
+        raise NotImplementedError()
+
     @abstractmethod
     def close(
         self,
@@ -36,12 +82,236 @@ class AsyncCacheStorage(ABC):
     ) -> None:
         raise NotImplementedError()
 
+    async def get_with_ttl(
+        self,
+        key: str,
+        **kwargs
+    ) -> Tuple[Optional[bytes], Optional[float]]:
+        """значение и оставшееся время жизни ключа в секундах"""
+        return await self.get(key, **kwargs), None
+
+    async def get_decoded(
+        self,
+        key: str,
+        decoder: Callable[[bytes], Any],
+        **kwargs
+    ) -> Any:
+        data = await self.get(key, **kwargs)
+        if not data:
+            return None
+
+        return decoder(data)
+
+    async def get_many(
+        self,
+        keys: List[str],
+        **kwargs
+    ) -> List[Optional[bytes]]:
+        return [await self.get(key, **kwargs) for key in keys]
+
+    async def get_many_with_ttl(
+        self,
+        keys: List[str],
+        **kwargs
+    ) -> List[Tuple[Optional[bytes], Optional[float]]]:
+        return [(data, None) for data in await self.get_many(keys, **kwargs)]
+
+    async def get_many_decoded(
+        self,
+        keys: List[str],
+        decoder: Callable[[bytes], Any],
+        **kwargs
+    ) -> List[Any]:
+        return [
+            decoder(data) if data else None
+            for data in await self.get_many(keys, **kwargs)
+        ]
+
+    async def set_many(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        expire: int,
+        **kwargs
+    ) -> None:
+        for key, value in items.items():
+            await self.set(key, value, expire=expire, **kwargs)
+
+    def forget(self, keys: List[str]) -> None:
+        """забыть копии ключей в памяти воркера, если они есть"""
+
 
 async_cache: Optional[AsyncCacheStorage] = None
 
 
-class RedisCacheStorage(AsyncCacheStorage, Redis):
-    ...
+class MeasuredConnectionsPool(ConnectionsPool):
+    """Пул aioredis, который считает ожидание соединения.
+
+    Обычные команды идут через общее соединение без захвата,
+    захватывают соединение пайплайны и блокирующие команды.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_timer = WaitTimer()
+
+    async def acquire(self, command=None, args=()):
+        if self.freesize:
+            return await super().acquire(command, args)
+
+        started = time.monotonic()
+        try:
+            return await super().acquire(command, args)
+        finally:
+            self.wait_timer.record(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'in_use': self.size - self.freesize,
+            'idle': self.freesize,
+            'minsize': self.minsize,
+            'maxsize': self.maxsize,
+            **self.wait_timer.stats(),
+        }
+
+
+class RedisCacheStorage(Redis, AsyncCacheStorage):
+    def pool_stats(self) -> dict:
+        if isinstance(self.connection, MeasuredConnectionsPool):
+            return self.connection.stats()
+        return {}
+
+    async def get_with_ttl(
+        self,
+        key: str,
+        **kwargs
+    ) -> Tuple[Optional[bytes], Optional[float]]:
+        pipe = self.pipeline()
+        pipe.get(key, **kwargs)
+        pipe.pttl(key)
+        data, ttl = await pipe.execute()
+        if ttl < 0:
+            return data, None
+
+        return data, ttl / 1000
+
+    async def get_many(
+        self,
+        keys: List[str],
+        **kwargs
+    ) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+
+        return await self.mget(*keys, **kwargs)
+
+    async def get_many_with_ttl(
+        self,
+        keys: List[str],
+        **kwargs
+    ) -> List[Tuple[Optional[bytes], Optional[float]]]:
+        if not keys:
+            return []
+
+        pipe = self.pipeline()
+        pipe.mget(*keys, **kwargs)
+        for key in keys:
+            pipe.pttl(key)
+        values, *ttls = await pipe.execute()
+        return [
+            (data, ttl / 1000 if ttl >= 0 else None)
+            for data, ttl in zip(values, ttls)
+        ]
+
+    async def set_many(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        expire: int,
+        **kwargs
+    ) -> None:
+        if not items:
+            return
+
+        pipe = self.pipeline()
+        queue_set(pipe, items, expire, **kwargs)
+        await pipe.execute()
+
+    async def set_tagged(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        tags: Dict[str, List[str]],
+        expire: int,
+        tag_expire: Optional[int] = None,
+        **kwargs
+    ) -> None:
+        if not items:
+            return
+
+        pipe = self.pipeline()
+        queue_tagged(pipe, items, tags, expire, tag_expire, **kwargs)
+        await pipe.execute()
+
+    async def pop_tagged(
+        self,
+        tags: List[str],
+        **kwargs
+    ) -> List[str]:
+        if not tags:
+            return []
+
+        # теги читаются и удаляются атомарно: SADD другого воркера
+        # попадёт либо в прочитанный тег, либо в новый
+        tr = self.multi_exec()
+        for tag in tags:
+            tr.smembers(tag, encoding='utf-8')
+        tr.delete(*tags)
+        *members, _ = await tr.execute()
+        keys = sorted(set().union(*members))
+        # SET записи идёт в пайплайне до SADD, так что ключ из тега
+        # уже записан и удаляется здесь
+        if keys:
+            await self.delete(*keys)
+        return keys
+
+    async def listen(
+        self,
+        channel: str,
+    ) -> AsyncIterator[bytes]:
+        [subscription] = await self.subscribe(channel)
+        try:
+            async for message in subscription.iter():
+                yield message
+        finally:
+            await self.unsubscribe(channel)
+
+
+def queue_set(
+    pipe: Pipeline,
+    items: Dict[str, Union[str, bytes]],
+    expire: int,
+    **kwargs
+) -> int:
+    """добавляет SET в пайплайн, возвращает число команд"""
+    for key, value in items.items():
+        pipe.set(key, value, expire=expire, **kwargs)
+    return len(items)
+
+
+def queue_tagged(
+    pipe: Pipeline,
+    items: Dict[str, Union[str, bytes]],
+    tags: Dict[str, List[str]],
+    expire: int,
+    tag_expire: Optional[int] = None,
+    **kwargs
+) -> int:
+    """добавляет записи с тегами в пайплайн, возвращает число команд"""
+    queue_set(pipe, items, expire, **kwargs)
+    for tag, keys in tags.items():
+        pipe.sadd(tag, *keys)
+        # тег живёт не меньше самого нового ключа в нём
+        pipe.expire(tag, max(expire, tag_expire or 0))
+    return len(items) + 2 * len(tags)
 
 
 async def get_redis() -> AsyncCacheStorage:
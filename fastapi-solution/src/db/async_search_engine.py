@@ -1,7 +1,16 @@
-from typing import Optional
+import asyncio
+import time
+from typing import List, Optional, Tuple, Union
+
+import aiohttp
 from elasticsearch import AsyncElasticsearch
+from elasticsearch._async.http_aiohttp import AIOHttpConnection, ESClientResponse
+from elasticsearch.client.utils import _make_path
+from elasticsearch.exceptions import HTTP_EXCEPTIONS, TransportError
 from abc import ABC, abstractmethod
 
+from src.core.metrics import WaitTimer
+
 
 class AsyncSearchEngine(ABC):
     @abstractmethod
@@ -13,6 +22,14 @@ class AsyncSearchEngine(ABC):
     ) -> str:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def search_many(
+        self,
+        searches: List[Tuple[str, dict]],
+        **kwargs
+    ) -> List[Union[dict, Exception]]:
+        raise NotImplementedError()
+
     @abstractmethod
     async def get(
         self,
@@ -22,6 +39,30 @@ class AsyncSearchEngine(ABC):
     ) -> dict:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def get_many(
+        self,
+        index: str,
+        entity_ids: List[str],
+        **kwargs
+    ) -> List[dict]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def open_point_in_time(
+        self,
+        index: str,
+        keep_alive: str,
+    ) -> str:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def close_point_in_time(
+        self,
+        pit_id: str,
+    ) -> None:
+        raise NotImplementedError()
+
     @abstractmethod
     async def close(
         self,
@@ -33,8 +74,129 @@ class AsyncSearchEngine(ABC):
 async_search_engine: Optional[AsyncSearchEngine] = None
 
 
-class AsyncElasticSearchEngine(AsyncSearchEngine, AsyncElasticsearch):
-    ...
+class MeasuredAIOHttpConnection(AIOHttpConnection):
+    """Соединение с узлом: keep-alive из настроек и счётчики пула"""
+
+    def __init__(self, *args, keepalive_timeout: float = 15.0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._keepalive_timeout = keepalive_timeout
+        self.wait_timer = WaitTimer()
+
+    async def _create_aiohttp_session(self) -> None:
+        # как в клиенте, плюс keep-alive и трассировка очереди за соединением
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_queued_start.append(self._queued_start)
+        trace.on_connection_queued_end.append(self._queued_end)
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            auto_decompress=True,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            response_class=ESClientResponse,
+            connector=aiohttp.TCPConnector(
+                limit=self._limit,
+                keepalive_timeout=self._keepalive_timeout,
+                use_dns_cache=True,
+                ssl=self._ssl_context,
+            ),
+            trace_configs=[trace],
+        )
+
+    async def _queued_start(self, session, context, params) -> None:
+        context.queued_at = time.monotonic()
+
+    async def _queued_end(self, session, context, params) -> None:
+        self.wait_timer.record(time.monotonic() - context.queued_at)
+
+    def stats(self) -> dict:
+        in_use = idle = 0
+        if self.session is not None:
+            # у TCPConnector нет публичных счётчиков соединений
+            connector = self.session.connector
+            in_use = len(connector._acquired)
+            idle = sum(len(conns) for conns in connector._conns.values())
+        return {
+            'in_use': in_use,
+            'idle': idle,
+            'maxsize': self._limit,
+            **self.wait_timer.stats(),
+        }
+
+
+class AsyncElasticSearchEngine(AsyncElasticsearch, AsyncSearchEngine):
+    def pool_stats(self) -> dict:
+        """счётчики пула по каждому узлу"""
+        return {
+            connection.host: connection.stats()
+            for connection in self.transport.connection_pool.connections
+            if isinstance(connection, MeasuredAIOHttpConnection)
+        }
+
+    async def search_many(
+        self,
+        searches: List[Tuple[str, dict]],
+        **kwargs
+    ) -> List[Union[dict, Exception]]:
+        """Поиски (индекс, запрос) одним _msearch.
+
+        Ответы в порядке запросов, ошибка отдельного поиска
+        возвращается исключением на его месте.
+        """
+        body = []
+        for index, query in searches:
+            body.append({'index': index})
+            body.append(query)
+        resp = await self.msearch(body=body, **kwargs)
+        return [
+            _search_error(item) if 'error' in item else item
+            for item in resp['responses']
+        ]
+
+    async def get_many(
+        self,
+        index: str,
+        entity_ids: List[str],
+        **kwargs
+    ) -> List[dict]:
+        """документы в порядке entity_ids, у ненайденных found=False"""
+        resp = await self.mget(
+            body={'ids': entity_ids},
+            index=index,
+            **kwargs
+        )
+        return resp['docs']
+
+    # в клиенте 7.9 нет методов для PIT, запросы отправляются напрямую
+    async def open_point_in_time(
+        self,
+        index: str,
+        keep_alive: str,
+    ) -> str:
+        resp = await self.transport.perform_request(
+            'POST',
+            _make_path(index, '_pit'),
+            params={'keep_alive': keep_alive}
+        )
+        return resp['id']
+
+    async def close_point_in_time(
+        self,
+        pit_id: str,
+    ) -> None:
+        await self.transport.perform_request(
+            'DELETE',
+            '/_pit',
+            body={'id': pit_id}
+        )
+
+
+def _search_error(item: dict) -> TransportError:
+    """То же исключение, что бросил бы отдельный search"""
+    status = item.get('status', 500)
+    error = item['error']
+    error_type = error.get('type') if isinstance(error, dict) else error
+    return HTTP_EXCEPTIONS.get(status, TransportError)(status, error_type, item)
 
 
 async def get_elastic_engine() -> AsyncSearchEngine:
@@ -0,0 +1,148 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+from src.db.async_search_engine import AsyncSearchEngine
+
+_Pending = Tuple[str, dict, asyncio.Future]
+
+
+class BatchingSearchEngine(AsyncSearchEngine):
+    """Поиски, пришедшие за короткое окно, уходят одним _msearch.
+
+    Пачка отправляется по истечении окна или при наборе max_batch
+    поисков. Каждый вызов получает свой ответ или свою ошибку,
+    ошибка всего запроса достаётся всем поискам пачки.
+    Поиски по снимку и с дополнительными параметрами идут как есть.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncSearchEngine,
+        window: float,
+        max_batch: int,
+    ) -> None:
+        self._engine = engine
+        self._window = window
+        self._max_batch = max_batch
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.searches = 0
+        self.batches = 0
+        self.batched = 0
+        self.largest = 0
+
+    async def search(
+        self,
+        index: str,
+        body: dict,
+        **kwargs
+    ) -> dict:
+        # у поиска по снимку нет индекса
+        if kwargs or index is None:
+            return await self._engine.search(index=index, body=body, **kwargs)
+
+        self.searches += 1
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((index, body, future))
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window, self._flush)
+        return await future
+
+    async def search_many(
+        self,
+        searches: List[Tuple[str, dict]],
+        **kwargs
+    ) -> list:
+        return await self._engine.search_many(searches, **kwargs)
+
+    async def get(
+        self,
+        index: str,
+        entity_id: str,
+        **kwargs
+    ) -> dict:
+        return await self._engine.get(index, entity_id, **kwargs)
+
+    async def get_many(
+        self,
+        index: str,
+        entity_ids: List[str],
+        **kwargs
+    ) -> List[dict]:
+        return await self._engine.get_many(index, entity_ids, **kwargs)
+
+    async def open_point_in_time(
+        self,
+        index: str,
+        keep_alive: str,
+    ) -> str:
+        return await self._engine.open_point_in_time(index, keep_alive)
+
+    async def close_point_in_time(
+        self,
+        pit_id: str,
+    ) -> None:
+        await self._engine.close_point_in_time(pit_id)
+
+    async def close(
+        self,
+        **kwargs
+    ) -> None:
+        self._flush()
+        await self._engine.close(**kwargs)
+
+    def stats(self) -> dict:
+        return {
+            'searches': self.searches,
+            'batches': self.batches,
+            'batched': self.batched,
+            'largest': self.largest,
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch: List[_Pending]) -> None:
+        if len(batch) == 1:
+            # один поиск дешевле отправить обычным запросом
+            index, body, future = batch[0]
+            try:
+                result = await self._engine.search(index=index, body=body)
+            except Exception as exc:
+                _set(future, exc)
+            else:
+                _set(future, result)
+            return
+
+        self.batches += 1
+        self.batched += len(batch)
+        self.largest = max(self.largest, len(batch))
+        try:
+            responses = await self._engine.search_many(
+                [(index, body) for index, body, _ in batch]
+            )
+        except Exception as exc:
+            for _, _, future in batch:
+                _set(future, exc)
+            return
+
+        for (_, _, future), resp in zip(batch, responses):
+            _set(future, resp)
+
+
+def _set(future: asyncio.Future, result) -> None:
+    # вызвавший мог уже отменить ожидание
+    if future.done():
+        return
+    if isinstance(result, Exception):
+        future.set_exception(result)
+    else:
+        future.set_result(result)
@@ -0,0 +1,272 @@
+import time
+from collections import OrderedDict
+from typing import (
+    Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+)
+
+from src.db.async_cache_storage import AsyncCacheStorage
+
+
+class _Entry:
+    __slots__ = ('value', 'expire_at', 'size', 'decoder', 'decoded')
+
+    def __init__(
+        self,
+        value: bytes,
+        expire_at: Optional[float],
+        size: int,
+    ) -> None:
+        self.value = value
+        self.expire_at = expire_at
+        self.size = size
+        self.decoder = None
+        self.decoded = None
+
+
+class LocalCacheStorage(AsyncCacheStorage):
+    """LRU-кеш в памяти воркера поверх другого хранилища.
+
+    Запись живёт не дольше, чем ключ во внешнем хранилище.
+    Для get_decoded хранится уже разобранное значение.
+    """
+
+    def __init__(
+        self,
+        storage: AsyncCacheStorage,
+        max_entries: int,
+        max_bytes: int,
+    ) -> None:
+        self._storage = storage
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(
+        self,
+        key: str,
+        **kwargs
+    ) -> Optional[bytes]:
+        entry = await self._get_entry(key, **kwargs)
+        if entry is None:
+            return None
+
+        return entry.value
+
+    async def get_with_ttl(
+        self,
+        key: str,
+        **kwargs
+    ) -> Tuple[Optional[bytes], Optional[float]]:
+        entry = await self._get_entry(key, **kwargs)
+        if entry is None:
+            return None, None
+        if entry.expire_at is None:
+            return entry.value, None
+
+        return entry.value, entry.expire_at - time.monotonic()
+
+    async def get_decoded(
+        self,
+        key: str,
+        decoder: Callable[[bytes], Any],
+        **kwargs
+    ) -> Any:
+        entry = await self._get_entry(key, **kwargs)
+        if entry is None:
+            return None
+        if entry.decoder is not decoder:
+            entry.decoded = decoder(entry.value)
+            entry.decoder = decoder
+
+        return entry.decoded
+
+    async def get_many(
+        self,
+        keys: List[str],
+        **kwargs
+    ) -> List[Optional[bytes]]:
+        return [
+            entry.value if entry else None
+            for entry in await self._get_entries(keys, **kwargs)
+        ]
+
+    async def get_many_decoded(
+        self,
+        keys: List[str],
+        decoder: Callable[[bytes], Any],
+        **kwargs
+    ) -> List[Any]:
+        result = []
+        for entry in await self._get_entries(keys, **kwargs):
+            if entry is None:
+                result.append(None)
+                continue
+            if entry.decoder is not decoder:
+                entry.decoded = decoder(entry.value)
+                entry.decoder = decoder
+            result.append(entry.decoded)
+
+        return result
+
+    async def set(
+        self,
+        key: str,
+        value: str,
+        expire: int,
+        **kwargs
+    ) -> None:
+        await self._storage.set(key, value, expire=expire, **kwargs)
+        self._put(key, value, expire or None)
+
+    async def set_many(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        expire: int,
+        **kwargs
+    ) -> None:
+        await self._storage.set_many(items, expire=expire, **kwargs)
+        for key, value in items.items():
+            self._put(key, value, expire or None)
+
+    async def set_tagged(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        tags: Dict[str, List[str]],
+        expire: int,
+        tag_expire: Optional[int] = None,
+        **kwargs
+    ) -> None:
+        await self._storage.set_tagged(
+            items,
+            tags,
+            expire=expire,
+            tag_expire=tag_expire,
+            **kwargs
+        )
+        for key, value in items.items():
+            self._put(key, value, expire or None)
+
+    async def pop_tagged(
+        self,
+        tags: List[str],
+        **kwargs
+    ) -> List[str]:
+        keys = await self._storage.pop_tagged(tags, **kwargs)
+        self.forget(keys)
+        return keys
+
+    async def publish(
+        self,
+        channel: str,
+        message: Union[str, bytes],
+    ) -> int:
+        return await self._storage.publish(channel, message)
+
+    def listen(
+        self,
+        channel: str,
+    ) -> AsyncIterator[bytes]:
+        return self._storage.listen(channel)
+
+    def forget(self, keys: List[str]) -> None:
+        for key in keys:
+            self._remove(key)
+
+    def close(self, **kwargs) -> None:
+        self._storage.close(**kwargs)
+
+    async def wait_closed(self, **kwargs) -> None:
+        await self._storage.wait_closed(**kwargs)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._size,
+        }
+
+    async def _get_entry(self, key: str, **kwargs) -> Optional[_Entry]:
+        entry = self._get_local(key)
+        if entry is not None:
+            return entry
+
+        value, ttl = await self._storage.get_with_ttl(key, **kwargs)
+        if not value:
+            return None
+
+        return self._put(key, value, ttl)
+
+    async def _get_entries(
+        self,
+        keys: List[str],
+        **kwargs
+    ) -> List[Optional[_Entry]]:
+        entries = [self._get_local(key) for key in keys]
+        missed = [key for key, entry in zip(keys, entries) if entry is None]
+        if not missed:
+            return entries
+
+        fetched = {}
+        values = await self._storage.get_many_with_ttl(missed, **kwargs)
+        for key, (value, ttl) in zip(missed, values):
+            if value:
+                fetched[key] = self._put(key, value, ttl)
+
+        return [
+            entry if entry is not None else fetched.get(key)
+            for key, entry in zip(keys, entries)
+        ]
+
+    def _get_local(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expire_at is None or entry.expire_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self._remove(key)
+
+        self.misses += 1
+        return None
+
+    def _put(
+        self,
+        key: str,
+        value,
+        ttl: Optional[float],
+    ) -> _Entry:
+        if isinstance(value, str):
+            value = value.encode()
+        expire_at = time.monotonic() + ttl if ttl else None
+        entry = _Entry(value, expire_at, len(key) + len(value))
+
+        self._remove(key)
+        if entry.size > self._max_bytes:
+            return entry
+
+        self._entries[key] = entry
+        self._size += entry.size
+        while (
+            len(self._entries) > self._max_entries
+            or self._size > self._max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+            self.evictions += 1
+
+        return entry
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
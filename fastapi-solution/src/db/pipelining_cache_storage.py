@@ -0,0 +1,263 @@
+import asyncio
+from functools import partial
+from typing import (
+    AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+)
+
+from aioredis.commands import Pipeline
+
+from src.db.async_cache_storage import (
+    AsyncCacheStorage,
+    RedisCacheStorage,
+    queue_set,
+    queue_tagged,
+)
+
+_Reads = Dict[str, List[asyncio.Future]]
+_Write = Tuple[Callable[[Pipeline], int], asyncio.Future]
+
+
+class PipeliningCacheStorage(AsyncCacheStorage):
+    """Команды одного тика цикла событий уходят в Redis одним пайплайном.
+
+    GET всех вызовов собираются в один MGET, PTTL для чтений со временем
+    жизни и записи добавляются в тот же пайплайн. Каждый вызов получает свой
+    результат или свою ошибку, код сервисов не меняется.
+    """
+
+    def __init__(
+        self,
+        storage: RedisCacheStorage,
+        max_batch: int,
+    ) -> None:
+        self._storage = storage
+        self._max_batch = max_batch
+        self._reads: _Reads = {}
+        self._ttl_reads: _Reads = {}
+        self._writes: List[_Write] = []
+        self._scheduled = False
+        self.reads = 0
+        self.writes = 0
+        self.flushes = 0
+        self.largest = 0
+
+    async def get(
+        self,
+        key: str,
+        **kwargs
+    ) -> Optional[bytes]:
+        if kwargs:
+            return await self._storage.get(key, **kwargs)
+
+        return await self._read(key)
+
+    async def get_many(
+        self,
+        keys: List[str],
+        **kwargs
+    ) -> List[Optional[bytes]]:
+        if kwargs or not keys:
+            return await self._storage.get_many(keys, **kwargs)
+
+        return list(await asyncio.gather(*(self._read(key) for key in keys)))
+
+    async def get_with_ttl(
+        self,
+        key: str,
+        **kwargs
+    ) -> Tuple[Optional[bytes], Optional[float]]:
+        if kwargs:
+            return await self._storage.get_with_ttl(key, **kwargs)
+
+        return await self._read(key, with_ttl=True)
+
+    async def get_many_with_ttl(
+        self,
+        keys: List[str],
+        **kwargs
+    ) -> List[Tuple[Optional[bytes], Optional[float]]]:
+        if kwargs or not keys:
+            return await self._storage.get_many_with_ttl(keys, **kwargs)
+
+        return list(await asyncio.gather(
+            *(self._read(key, with_ttl=True) for key in keys)
+        ))
+
+    async def set(
+        self,
+        key: str,
+        value: Union[str, bytes],
+        expire: int,
+        **kwargs
+    ) -> None:
+        await self._write(partial(
+            queue_set, items={key: value}, expire=expire, **kwargs
+        ))
+
+    async def set_many(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        expire: int,
+        **kwargs
+    ) -> None:
+        if not items:
+            return
+
+        await self._write(partial(
+            queue_set, items=items, expire=expire, **kwargs
+        ))
+
+    async def set_tagged(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        tags: Dict[str, List[str]],
+        expire: int,
+        tag_expire: Optional[int] = None,
+        **kwargs
+    ) -> None:
+        if not items:
+            return
+
+        await self._write(partial(
+            queue_tagged,
+            items=items,
+            tags=tags,
+            expire=expire,
+            tag_expire=tag_expire,
+            **kwargs
+        ))
+
+    async def pop_tagged(
+        self,
+        tags: List[str],
+        **kwargs
+    ) -> List[str]:
+        return await self._storage.pop_tagged(tags, **kwargs)
+
+    async def publish(
+        self,
+        channel: str,
+        message: Union[str, bytes],
+    ) -> int:
+        return await self._storage.publish(channel, message)
+
+    def listen(
+        self,
+        channel: str,
+    ) -> AsyncIterator[bytes]:
+        return self._storage.listen(channel)
+
+    def forget(self, keys: List[str]) -> None:
+        self._storage.forget(keys)
+
+    def close(self, **kwargs) -> None:
+        self._flush()
+        self._storage.close(**kwargs)
+
+    async def wait_closed(self, **kwargs) -> None:
+        await self._storage.wait_closed(**kwargs)
+
+    def stats(self) -> dict:
+        return {
+            'reads': self.reads,
+            'writes': self.writes,
+            'flushes': self.flushes,
+            'largest': self.largest,
+        }
+
+    def _read(self, key: str, with_ttl: bool = False) -> asyncio.Future:
+        self.reads += 1
+        future = asyncio.get_event_loop().create_future()
+        reads = self._ttl_reads if with_ttl else self._reads
+        reads.setdefault(key, []).append(future)
+        self._schedule()
+        return future
+
+    def _write(self, queue: Callable[[Pipeline], int]) -> asyncio.Future:
+        self.writes += 1
+        future = asyncio.get_event_loop().create_future()
+        self._writes.append((queue, future))
+        self._schedule()
+        return future
+
+    def _schedule(self) -> None:
+        pending = len(self._reads) + len(self._ttl_reads) + len(self._writes)
+        if pending >= self._max_batch:
+            self._flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            asyncio.get_event_loop().call_soon(self._flush)
+
+    def _flush(self) -> None:
+        self._scheduled = False
+        reads, self._reads = self._reads, {}
+        ttl_reads, self._ttl_reads = self._ttl_reads, {}
+        writes, self._writes = self._writes, []
+        if reads or ttl_reads or writes:
+            asyncio.ensure_future(self._send(reads, ttl_reads, writes))
+
+    async def _send(
+        self,
+        reads: _Reads,
+        ttl_reads: _Reads,
+        writes: List[_Write],
+    ) -> None:
+        self.flushes += 1
+        self.largest = max(
+            self.largest, len(reads) + len(ttl_reads) + len(writes)
+        )
+        pipe = self._storage.pipeline()
+        # чтения со временем жизни берут значение из того же MGET
+        keys = list(dict.fromkeys([*reads, *ttl_reads]))
+        ttl_keys = list(ttl_reads)
+        if keys:
+            pipe.mget(*keys)
+        for key in ttl_keys:
+            pipe.pttl(key)
+        counts = [queue(pipe) for queue, _ in writes]
+        try:
+            results = await pipe.execute(return_exceptions=True)
+        except Exception as exc:
+            for futures in [*reads.values(), *ttl_reads.values()]:
+                for future in futures:
+                    _set(future, exc)
+            for _, future in writes:
+                _set(future, exc)
+            return
+
+        if keys:
+            values, *results = results
+            ttls, results = results[:len(ttl_keys)], results[len(ttl_keys):]
+            failed = isinstance(values, Exception)
+            found = {} if failed else dict(zip(keys, values))
+            for key, futures in reads.items():
+                for future in futures:
+                    _set(future, values if failed else found[key])
+            for key, ttl in zip(ttl_keys, ttls):
+                if failed or isinstance(ttl, Exception):
+                    value = values if failed else ttl
+                else:
+                    # как у RedisCacheStorage: без срока жизни или без ключа - None
+                    value = (found[key], ttl / 1000 if ttl >= 0 else None)
+                for future in ttl_reads[key]:
+                    _set(future, value)
+
+        # у каждой записи свой срез ответов пайплайна
+        start = 0
+        for (_, future), count in zip(writes, counts):
+            errors = [
+                result for result in results[start:start + count]
+                if isinstance(result, Exception)
+            ]
+            start += count
+            _set(future, errors[0] if errors else None)
+
+
+def _set(future: asyncio.Future, result) -> None:
+    # вызвавший мог уже отменить ожидание
+    if future.done():
+        return
+    if isinstance(result, Exception):
+        future.set_exception(result)
+    else:
+        future.set_result(result)
@@ -1,13 +1,29 @@
+import asyncio
+
+import aiohttp
 import aioredis
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
+from src import auth, warmup
+from src.api import conditional, internal, response_cache
 from src.api.v1 import films, persons, genres
-from src.core import config
+from src.core import config, metrics
+from src.core.logger import logger
 from src.db import async_cache_storage
 from src.db import async_search_engine
-from src.db.async_cache_storage import RedisCacheStorage
-from src.db.async_search_engine import AsyncElasticSearchEngine
+from src.db.async_cache_storage import MeasuredConnectionsPool, RedisCacheStorage
+from src.db.local_cache_storage import LocalCacheStorage
+from src.db.pipelining_cache_storage import PipeliningCacheStorage
+from src.db.async_search_engine import (
+    AsyncElasticSearchEngine, MeasuredAIOHttpConnection
+)
+from src.db.batching_search_engine import BatchingSearchEngine
+from src.models.genre import Genre
+from src.services import catalog, etag, invalidation
+from src.services.film import get_film_service
+from src.services.genre import get_genre_service
+from src.services.person import get_person_service
 
 app = FastAPI(
     title=config.PROJECT_NAME,
@@ -15,6 +31,10 @@ app = FastAPI(
     openapi_url='/api/openapi.json',
     default_response_class=ORJSONResponse,
 )
+app.middleware('http')(conditional.conditional_get)
+app.add_exception_handler(etag.NotModified, conditional.not_modified)
+# снаружи conditional_get: попадание в кеш не доходит до остальных слоёв
+app.add_middleware(response_cache.ResponseCacheMiddleware)
 
 
 @app.on_event('startup')
@@ -26,28 +46,176 @@ async def startup():
             redis_dsn['port']
          ),
         password=redis_dsn['password'],
-        minsize=10,
-        maxsize=20,
+        minsize=redis_dsn['pool_minsize'],
+        maxsize=redis_dsn['pool_maxsize'],
+        timeout=redis_dsn['connect_timeout'],
+        pool_cls=MeasuredConnectionsPool,
     )
-    async_cache_storage.async_cache = RedisCacheStorage(redis_conn)
+    # хранилище на самом пуле: подписки идут через execute_pubsub пула
+    async_cache_storage.async_cache = RedisCacheStorage(redis_conn.connection)
+    metrics.register('redis_pool', async_cache_storage.async_cache.pool_stats)
+    if redis_dsn['auto_pipeline']:
+        pipelining_cache = PipeliningCacheStorage(
+            async_cache_storage.async_cache,
+            max_batch=redis_dsn['pipeline_max_batch'],
+        )
+        metrics.register('redis_pipeline', pipelining_cache.stats)
+        async_cache_storage.async_cache = pipelining_cache
+
+    cache_settings = config.cache_settings
+    if cache_settings.local_enabled:
+        local_cache = LocalCacheStorage(
+            async_cache_storage.async_cache,
+            max_entries=cache_settings.local_max_entries,
+            max_bytes=cache_settings.local_max_bytes,
+        )
+        metrics.register('local_cache', local_cache.stats)
+        async_cache_storage.async_cache = local_cache
 
 
     elastic_dsn = config.ElasticSearchSettings().dict()
     elastic_engine = AsyncElasticSearchEngine(
         hosts=[
             f'{elastic_dsn["host"]}:{elastic_dsn["port"]}'
-        ]
+        ],
+        connection_class=MeasuredAIOHttpConnection,
+        maxsize=elastic_dsn['pool_maxsize'],
+        timeout=elastic_dsn['timeout'],
+        max_retries=elastic_dsn['max_retries'],
+        retry_on_timeout=elastic_dsn['retry_on_timeout'],
+        keepalive_timeout=elastic_dsn['keepalive_timeout'],
     )
     async_search_engine.async_search_engine = elastic_engine
+    metrics.register('elastic_pool', elastic_engine.pool_stats)
+    if elastic_dsn['batch_window_ms'] > 0:
+        batching_engine = BatchingSearchEngine(
+            elastic_engine,
+            window=elastic_dsn['batch_window_ms'] / 1000,
+            max_batch=elastic_dsn['batch_max_size'],
+        )
+        metrics.register('search_batching', batching_engine.stats)
+        async_search_engine.async_search_engine = batching_engine
+
+    if cache_settings.genre_catalog_enabled:
+        genre_catalog = catalog.CatalogSnapshot(
+            elastic_engine,
+            index='genres',
+            model=Genre,
+            refresh_interval=cache_settings.genre_catalog_refresh,
+            max_size=cache_settings.genre_catalog_max_size,
+        )
+        await genre_catalog.refresh()
+        genre_catalog.start_refresh()
+        metrics.register('genre_catalog', genre_catalog.stats)
+        catalog.genre_catalog = genre_catalog
+
+    invalidation.cache_invalidator = invalidation.CacheInvalidator(
+        async_cache_storage.async_cache,
+        catalogs={'genres': catalog.genre_catalog} if catalog.genre_catalog else {},
+    )
+    invalidation.cache_invalidator.start()
+    metrics.register('invalidation', invalidation.cache_invalidator.stats)
+
+    if cache_settings.response_enabled:
+        response_cache.response_cache = response_cache.ResponseCache(
+            async_cache_storage.async_cache,
+            expire={
+                'list': cache_settings.response_list_expire,
+                'search': cache_settings.response_search_expire,
+                'detail': cache_settings.response_detail_expire,
+            },
+            max_bytes=cache_settings.response_max_bytes,
+            tag_expire=max(
+                cache_settings.film_expire + cache_settings.film_stale,
+                cache_settings.person_expire + cache_settings.person_stale,
+                cache_settings.genre_expire + cache_settings.genre_stale,
+            ),
+        )
+        metrics.register('response_cache', response_cache.response_cache.stats)
+
+    auth_settings = config.AuthSettings()
+    auth_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=auth_settings.pool_size),
+        timeout=aiohttp.ClientTimeout(total=auth_settings.timeout),
+    )
+    local_validator = None
+    if auth_settings.verify_mode == 'local':
+        local_validator = auth.LocalTokenValidator(
+            session=auth_session,
+            algorithms=auth_settings.algorithms,
+            jwks_url=auth_settings.jwks_url,
+            jwks_path=auth_settings.jwks_path,
+            public_key_path=auth_settings.public_key_path,
+            refresh_interval=auth_settings.jwks_refresh_interval,
+            issuer=auth_settings.issuer,
+            audience=auth_settings.audience,
+            leeway=auth_settings.leeway,
+        )
+        try:
+            await local_validator.load()
+        except Exception:
+            logger.exception('public keys are not loaded, fallback to auth service')
+        local_validator.start_refresh()
+
+    auth.token_verifier = auth.TokenVerifier(
+        session=auth_session,
+        cache=async_cache_storage.async_cache,
+        url=auth_settings.url,
+        cache_expire=auth_settings.cache_expire,
+        local_cache_size=auth_settings.local_cache_size,
+        local_validator=local_validator,
+    )
+
+    warmup_settings = config.WarmUpSettings()
+    if warmup_settings.enabled:
+        cache = async_cache_storage.async_cache
+        search_engine = async_search_engine.async_search_engine
+        # аргументы именованные, как их передаёт Depends: lru_cache
+        # различает вызовы по способу передачи, а сервисы нужны те же
+        warmup.cache_warmup = warmup.CacheWarmUp(
+            film_service=get_film_service(
+                cache=cache, search_engine=search_engine
+            ),
+            person_service=get_person_service(
+                cache=cache, search_engine=search_engine
+            ),
+            genre_service=get_genre_service(
+                cache=cache,
+                search_engine=search_engine,
+                catalog=catalog.genre_catalog
+            ),
+            pages=warmup_settings.pages,
+            page_size=warmup_settings.page_size,
+            concurrency=warmup_settings.concurrency,
+            film_ids=warmup_settings.film_ids,
+            person_ids=warmup_settings.person_ids,
+        )
+        metrics.register('warmup', warmup.cache_warmup.stats)
+        # воркер отвечает сразу, /internal/ready - после прогрева
+        app.state.warmup_task = asyncio.ensure_future(
+            warmup.cache_warmup.run()
+        )
 
 
 @app.on_event('shutdown')
 async def shutdown():
+    if warmup.cache_warmup and not warmup.cache_warmup.ready:
+        app.state.warmup_task.cancel()
+    await invalidation.cache_invalidator.close()
+    await auth.token_verifier.close()
+    if catalog.genre_catalog:
+        await catalog.genre_catalog.close()
     async_cache_storage.async_cache.close()
     await async_cache_storage.async_cache.wait_closed()
     await async_search_engine.async_search_engine.close()
 
 
+app.include_router(
+    internal.router,
+    prefix='/internal',
+    tags=['internal']
+)
+
 app.include_router(
     films.router,
     prefix='/api/v1/films',
@@ -1,5 +1,8 @@
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Type
+
 import orjson
-from pydantic import BaseModel
+from pydantic import BaseModel, create_model
 
 def orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
@@ -7,4 +10,112 @@ def orjson_dumps(v, *, default):
 class BaseOrjsonModel(BaseModel): 
       class Config: 
             json_loads = orjson.loads 
-            json_dumps = orjson_dumps
\ No newline at end of file
+            json_dumps = orjson_dumps
+
+
+@lru_cache(maxsize=None)
+def projection_model(
+    model: Type[BaseModel],
+    fields: Tuple[str, ...],
+) -> Type[BaseOrjsonModel]:
+    """Модель только с выбранными полями, все поля необязательные"""
+    return create_model(
+        f'{model.__name__}Projection',
+        __base__=BaseOrjsonModel,
+        **{
+            name: (Optional[model.__fields__[name].outer_type_], None)
+            for name in fields
+        }
+    )
+
+
+# типы, которые pydantic приводит сам: id в _source бывает числом
+SCALAR_TYPES = (str, int, float)
+
+
+class Record:
+    """Сущность без проверки типов: только поля модели в __slots__.
+
+    Собирается в разы быстрее модели pydantic, поэтому используется
+    между сервисами и сериализацией. Документы проверены при загрузке
+    в индекс, полная проверка - в строгом режиме.
+    """
+    __slots__ = ()
+    # поля в порядке модели и значения для отсутствующих
+    __fields_defaults__: Dict[str, Any] = {}
+    # простые поля и их типы из модели
+    __fields_casts__: Dict[str, type] = {}
+
+    def __init__(self, **values: Any) -> None:
+        casts = self.__fields_casts__
+        for name, value in values.items():
+            if name in self.__fields_defaults__:
+                cast = casts.get(name)
+                if (
+                    cast is not None
+                    and type(value) is not cast
+                    and type(value) in SCALAR_TYPES
+                ):
+                    value = cast(value)
+                setattr(self, name, value)
+
+    def __getattr__(self, name: str) -> Any:
+        # вызывается только для незаданных полей
+        try:
+            return self.__fields_defaults__[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        # как у моделей pydantic: dict(record) и jsonable_encoder
+        return iter(self.dict().items())
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and self.dict() == other.dict()
+
+    def __repr__(self) -> str:
+        values = ', '.join(f'{name}={value!r}' for name, value in self)
+        return f'{type(self).__name__}({values})'
+
+    @classmethod
+    def parse_obj(cls, obj: dict) -> 'Record':
+        return cls(**obj)
+
+    def dict(self, exclude_unset: bool = False) -> dict:
+        result = {}
+        for name, default in self.__fields_defaults__.items():
+            try:
+                result[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                if not exclude_unset:
+                    result[name] = default
+        return result
+
+
+@lru_cache(maxsize=None)
+def record_model(
+    model: Type[BaseModel],
+    fields: Optional[Tuple[str, ...]] = None,
+) -> Type[Record]:
+    """Тип записи с полями модели, у выбранных полей значения по умолчанию None"""
+    if fields is None:
+        defaults = {
+            name: field.default for name, field in model.__fields__.items()
+        }
+    else:
+        defaults = dict.fromkeys(fields)
+    casts = {
+        name: model.__fields__[name].outer_type_
+        for name in defaults
+        if model.__fields__[name].outer_type_ in SCALAR_TYPES
+    }
+
+    return type(
+        f'{model.__name__}Record',
+        (Record,),
+        {
+            '__slots__': tuple(defaults),
+            '__fields_defaults__': defaults,
+            '__fields_casts__': casts,
+        }
+    )
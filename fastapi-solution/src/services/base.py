@@ -0,0 +1,609 @@
+import asyncio
+import logging
+import time
+from functools import partial
+from http import HTTPStatus
+from typing import (
+    Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type, Union
+)
+
+import orjson
+from elasticsearch import NotFoundError, RequestError
+from fastapi import HTTPException
+
+from src.core import metrics
+from src.core.constants import INVALID_CURSOR_MESS
+from src.core.config import cache_settings, search_settings
+from src.core.singleflight import SingleFlight
+from src.db.async_cache_storage import AsyncCacheStorage
+from src.db.async_search_engine import AsyncSearchEngine
+from src.models.base_model import (
+    BaseOrjsonModel, Record, projection_model, record_model
+)
+from .cache import (
+    CacheEntry,
+    RawEntity,
+    build_id_key,
+    build_search_key,
+    build_search_tag_key,
+    build_tag_key,
+    build_total_key,
+)
+from . import etag
+from .catalog import parse_order
+from .utils import get_result
+
+logger = logging.getLogger(__name__)
+
+# None - все поля модели
+Fields = Optional[Tuple[str, ...]]
+# загрузки JSON для ответа как есть отдельно от загрузок моделей
+RAW_FLIGHT_SUFFIX = ':raw'
+
+
+class BaseService:
+    """Чтение сущностей из кеша, при промахе - из эластика.
+
+    Одновременные промахи по одному ключу в воркере
+    делают один запрос в эластик. Устаревшая запись отдаётся сразу,
+    а обновляется одной фоновой задачей.
+    """
+    index: str
+    model: Type[BaseOrjsonModel]
+    cache_expire: int
+    cache_stale: int
+    early_refresh_beta: float = cache_settings.early_refresh_beta
+    snapshot_keep_alive: str = search_settings.snapshot_keep_alive
+    trusted_source: bool = search_settings.trusted_source
+    strict_models: bool = search_settings.strict_models
+    total_hits_threshold: int = search_settings.total_hits_threshold
+    index_total_expire: int = cache_settings.index_total_expire
+
+    def __init__(
+        self,
+        cache: AsyncCacheStorage,
+        search_engine: AsyncSearchEngine,
+    ) -> None:
+        self._cache = cache
+        self._search_engine = search_engine
+        self._flight = SingleFlight()
+        self._decoders: Dict[Fields, Tuple[Callable, Callable]] = {}
+        self.stale_hits = 0
+        self.refreshes = 0
+        metrics.register(f'{self.index}_service', self.stats)
+
+    async def get_by_id(
+        self,
+        entity_id: str,
+        fields: Fields = None,
+    ) -> Optional[BaseOrjsonModel]:
+        decode_entity, _ = self._get_decoders(fields)
+        return await self._cached(
+            build_id_key(self.index, entity_id, fields),
+            partial(self._get_from_elastic, entity_id, fields),
+            decode_entity
+        )
+
+    async def get_by_ids(
+        self,
+        entity_ids: List[str],
+        fields: Fields = None,
+    ) -> List[Optional[BaseOrjsonModel]]:
+        """Сущности в порядке entity_ids, None для ненайденных.
+
+        Кеш читается одним MGET, промахи - одним mget в эластик.
+        """
+        decode_entity, _ = self._get_decoders(fields)
+        keys = [
+            build_id_key(self.index, entity_id, fields)
+            for entity_id in entity_ids
+        ]
+        entries = await self._cache.get_many_decoded(keys, decode_entity)
+
+        missed = []
+        for entity_id, key, entry in zip(entity_ids, keys, entries):
+            if entry is None:
+                if entity_id not in missed:
+                    missed.append(entity_id)
+            else:
+                self._refresh_if_needed(
+                    key,
+                    entry,
+                    partial(self._get_from_elastic, entity_id, fields)
+                )
+
+        fetched = {}
+        if missed:
+            fetched = await self._get_many_to_cache(missed, fields)
+
+        result = []
+        for entity_id, entry in zip(entity_ids, entries):
+            if entry is None:
+                entry = fetched.get(entity_id)
+            if entry is None:
+                etag.record(f'{etag.MISSING}:{entity_id}')
+                result.append(None)
+            else:
+                etag.record(entry.etag)
+                result.append(entry.value)
+
+        if etag.collects_tags():
+            # тег ненайденной сущности удалит ответ, когда она появится
+            etag.record_tags(
+                build_tag_key(self.index, entity_id)
+                for entity_id in entity_ids
+            )
+        return result
+
+    async def get_raw_by_id(
+        self,
+        entity_id: str,
+        fields: Fields = None,
+    ) -> Optional[bytes]:
+        """JSON сущности для ответа как есть, без моделей.
+
+        Из кеша значение вырезается из записи, при промахе
+        проецируется из _source.
+        """
+        key = build_id_key(self.index, entity_id, fields)
+        entity = await self._cached(
+            key,
+            partial(self._get_source_from_elastic, entity_id, fields),
+            partial(CacheEntry.decode_raw, entity_id=entity_id),
+            # запись та же, но загрузка отдаёт RawEntity, а не модель
+            flight_key=key + RAW_FLIGHT_SUFFIX
+        )
+        return entity.json if entity else None
+
+    def stats(self) -> dict:
+        return {
+            **self._flight.stats(),
+            'stale_hits': self.stale_hits,
+            'refreshes': self.refreshes,
+        }
+
+    async def _search(
+        self,
+        elastic_query: dict,
+        page_size: int,
+        page_number: int,
+        fields: Fields = None,
+        sort: Optional[str] = None,
+    ) -> dict:
+        if fields is not None:
+            elastic_query = {**elastic_query, '_source': list(fields)}
+        if 'track_total_hits' not in elastic_query:
+            # дальше порога эластик не считает, число - нижняя граница
+            elastic_query = {
+                **elastic_query,
+                'track_total_hits': self.total_hits_threshold
+            }
+        _, decode_search_result = self._get_decoders(fields)
+        data = await self._cached(
+            build_search_key(self.index, elastic_query),
+            partial(self._search_in_elastic, elastic_query, fields),
+            decode_search_result
+        )
+        if data['total'] is None:
+            data = {**data, 'total': await self._index_total()}
+
+        return get_result(
+            data,
+            page_size,
+            page_number,
+            sort
+        )
+
+    async def _sorted_search(
+        self,
+        order_by: str,
+        page_size: int,
+        page_number: int,
+        fields: Fields = None,
+        cursor: Optional[dict] = None,
+        snapshot: bool = False,
+    ) -> dict:
+        """Отсортированный список: страница по номеру или после курсора.
+
+        С курсором эластик не пропускает from документов,
+        а продолжает с search_after, поэтому глубина страницы
+        не влияет на время ответа и не упирается в max_result_window.
+        При snapshot страницы читаются из снимка индекса (PIT),
+        и переиндексация не сдвигает их.
+        """
+        if cursor is not None:
+            order_by = cursor['sort']
+
+        field, order = parse_order(order_by)
+        sort = [{field: {'order': order}}]
+        # id делает порядок однозначным при равных значениях поля
+        if field != 'id':
+            sort.append({'id': {'order': 'asc'}})
+
+        # число документов индекса берётся из отдельной записи кеша
+        elastic_query = {
+            'size': page_size,
+            'sort': sort,
+            'track_total_hits': False,
+        }
+        if cursor is not None:
+            elastic_query['search_after'] = cursor['after']
+        else:
+            elastic_query['from'] = page_number * page_size
+
+        pit_id = cursor.get('pit') if cursor is not None else None
+        try:
+            if pit_id is not None or snapshot:
+                return await self._search_in_snapshot(
+                    elastic_query,
+                    pit_id,
+                    page_size,
+                    page_number,
+                    fields,
+                    order_by
+                )
+
+            return await self._search(
+                elastic_query,
+                page_size,
+                page_number,
+                fields,
+                order_by
+            )
+        except RequestError:
+            # эластик не принял search_after или снимок из курсора
+            if cursor is None:
+                raise
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail=INVALID_CURSOR_MESS
+            )
+
+    async def _search_in_snapshot(
+        self,
+        elastic_query: dict,
+        pit_id: Optional[str],
+        page_size: int,
+        page_number: int,
+        fields: Fields,
+        sort: str,
+    ) -> dict:
+        """Страница из снимка индекса, мимо кеша.
+
+        Каждый запрос продлевает жизнь снимка. Если снимок истёк,
+        открывается новый и листание продолжается с того же места.
+        На последней странице снимок закрывается.
+        """
+        if fields is not None:
+            elastic_query = {**elastic_query, '_source': list(fields)}
+        if pit_id is None:
+            pit_id = await self._open_snapshot()
+        # страница снимка не из кеша, ETag у ответа не будет
+        etag.record(None)
+
+        try:
+            data = await self._search_in_elastic(
+                self._with_snapshot(elastic_query, pit_id),
+                fields
+            )
+        except NotFoundError:
+            logger.warning('search snapshot expired, opening a new one')
+            data = await self._search_in_elastic(
+                self._with_snapshot(elastic_query, await self._open_snapshot()),
+                fields
+            )
+
+        data['total'] = await self._index_total()
+        result = get_result(data, page_size, page_number, sort)
+        if 'next_cursor' not in result['pagination'] and 'pit' in data:
+            await self._close_snapshot(data['pit'])
+        return result
+
+    async def _open_snapshot(self) -> str:
+        return await self._search_engine.open_point_in_time(
+            self.index,
+            self.snapshot_keep_alive
+        )
+
+    async def _close_snapshot(self, pit_id: str) -> None:
+        try:
+            await self._search_engine.close_point_in_time(pit_id)
+        except NotFoundError:
+            pass
+
+    def _with_snapshot(self, elastic_query: dict, pit_id: str) -> dict:
+        return {
+            **elastic_query,
+            'pit': {'id': pit_id, 'keep_alive': self.snapshot_keep_alive},
+        }
+
+    async def _cached(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        decoder: Callable[[bytes], Optional[CacheEntry]],
+        expire: Optional[int] = None,
+        flight_key: Optional[str] = None,
+    ) -> Any:
+        """expire - время свежести записи, если не как у сервиса;
+        flight_key - ключ загрузки, если значение загрузки не как у
+        других читателей записи"""
+        flight_key = flight_key or key
+        if etag.expects_match():
+            # совпадение решается по etag записи, модели не собираются
+            data = await self._cache.get(key)
+            if data:
+                etag.check(CacheEntry.peek_etag(data))
+            entry = decoder(data) if data else None
+        else:
+            entry = await self._cache.get_decoded(key, decoder)
+
+        if entry is None:
+            entry = await self._flight.do(
+                flight_key,
+                partial(self._fetch_to_cache, key, fetch, expire)
+            )
+            if entry is None:
+                return None
+        else:
+            self._refresh_if_needed(key, entry, fetch, expire, flight_key)
+
+        etag.record(entry.etag)
+        if etag.collects_tags():
+            etag.record_tags(self._tags(entry.value))
+        return entry.value
+
+    async def _fetch_to_cache(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        expire: Optional[int] = None,
+    ) -> Optional[CacheEntry]:
+        started = time.monotonic()
+        value = await fetch()
+        if value is None:
+            return None
+
+        expire = expire or self.cache_expire
+        entry = CacheEntry.create(
+            value,
+            expire,
+            time.monotonic() - started
+        )
+        await self._cache.set_tagged(
+            {key: entry.encode()},
+            {tag: [key] for tag in self._tags(value)},
+            expire=expire + self.cache_stale
+        )
+        return entry
+
+    async def _get_many_to_cache(
+        self,
+        entity_ids: List[str],
+        fields: Fields,
+    ) -> Dict[str, CacheEntry]:
+        model = self._get_model(fields)
+        started = time.monotonic()
+        docs = await self._search_engine.get_many(
+            self.index,
+            entity_ids,
+            **self._source_params(fields)
+        )
+        delta = time.monotonic() - started
+
+        fetched = {
+            doc['_id']: CacheEntry.create(
+                model(**doc['_source']),
+                self.cache_expire,
+                delta
+            )
+            for doc in docs
+            if doc.get('found')
+        }
+        keys = {
+            entity_id: build_id_key(self.index, entity_id, fields)
+            for entity_id in fetched
+        }
+        await self._cache.set_tagged(
+            {
+                keys[entity_id]: entry.encode()
+                for entity_id, entry in fetched.items()
+            },
+            {
+                build_tag_key(self.index, entity_id): [key]
+                for entity_id, key in keys.items()
+            },
+            expire=self.cache_expire + self.cache_stale
+        )
+        return fetched
+
+    def _refresh_if_needed(
+        self,
+        key: str,
+        entry: CacheEntry,
+        fetch: Callable[[], Awaitable[Any]],
+        expire: Optional[int] = None,
+        flight_key: Optional[str] = None,
+    ) -> None:
+        flight_key = flight_key or key
+        if entry.fresh_until <= time.time():
+            self.stale_hits += 1
+        if (
+            not self._flight.running(flight_key)
+            and entry.should_refresh(self.early_refresh_beta)
+        ):
+            self._refresh_in_background(key, fetch, expire, flight_key)
+
+    def _refresh_in_background(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        expire: Optional[int] = None,
+        flight_key: Optional[str] = None,
+    ) -> None:
+        self.refreshes += 1
+        future = self._flight.start(
+            flight_key or key,
+            partial(self._fetch_to_cache, key, fetch, expire)
+        )
+        future.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception():
+            logger.error(
+                'cache refresh failed',
+                exc_info=future.exception()
+            )
+
+    async def _get_from_elastic(
+        self,
+        entity_id: str,
+        fields: Fields,
+    ) -> Optional[BaseOrjsonModel]:
+        try:
+            doc = await self._search_engine.get(
+                self.index,
+                entity_id,
+                **self._source_params(fields)
+            )
+        except NotFoundError:
+            return None
+
+        return self._get_model(fields)(**doc['_source'])
+
+    async def _get_source_from_elastic(
+        self,
+        entity_id: str,
+        fields: Fields,
+    ) -> Optional[RawEntity]:
+        try:
+            doc = await self._search_engine.get(
+                self.index,
+                entity_id,
+                **self._source_params(fields)
+            )
+        except NotFoundError:
+            return None
+
+        if not self.trusted_source:
+            entity = self._get_strict_model(fields)(**doc['_source']).dict()
+        else:
+            # те же ключи, порядок и простые типы, что у dict() модели
+            entity = record_model(self.model, fields)(**doc['_source']).dict()
+        return RawEntity(entity_id, orjson.dumps(entity))
+
+    async def _search_in_elastic(
+        self,
+        elastic_query: dict,
+        fields: Fields,
+    ) -> dict:
+        """В кеш попадает только число найденных, поля модели
+        и значения sort последнего документа для курсора"""
+        model = self._get_model(fields)
+        resp = await self._search_engine.search(
+            # запрос по снимку не указывает индекс, он задан в снимке
+            index=None if 'pit' in elastic_query else self.index,
+            body=elastic_query
+        )
+        hits = resp['hits']['hits']
+        # без track_total_hits числа нет, его дополняет _index_total
+        total = resp['hits'].get('total')
+        data = {
+            'total': total['value'] if total else None,
+            'total_exact': not total or total.get('relation', 'eq') == 'eq',
+            'items': [model(**hit['_source']) for hit in hits],
+            'after': hits[-1].get('sort') if hits else None,
+        }
+        if 'pit_id' in resp:
+            # эластик может вернуть новый id снимка, старый дальше не нужен
+            data['pit'] = resp['pit_id']
+        return data
+
+    async def _index_total(self) -> int:
+        """Число документов для списков всего индекса.
+
+        Точный подсчёт дорогой, поэтому он в отдельной записи
+        с долгим сроком свежести, а страницы списков не считают.
+        """
+        return await self._cached(
+            build_total_key(self.index),
+            self._count_in_elastic,
+            CacheEntry.decode,
+            expire=self.index_total_expire
+        )
+
+    async def _count_in_elastic(self) -> int:
+        resp = await self._search_engine.search(
+            index=self.index,
+            body={'size': 0, 'track_total_hits': True}
+        )
+        return resp['hits']['total']['value']
+
+    def _tags(self, value: Any) -> List[str]:
+        """Теги записи: id сущностей в ней, у страниц поиска - ещё тег поиска"""
+        if isinstance(value, int):
+            # число документов меняется вместе со списками
+            return [build_search_tag_key(self.index)]
+        if isinstance(value, dict):
+            # у агрегаций нет документов, только тег поиска
+            return [
+                build_search_tag_key(self.index),
+                *(
+                    build_tag_key(self.index, item.id)
+                    for item in value.get('items', ())
+                ),
+            ]
+
+        return [build_tag_key(self.index, value.id)]
+
+    def _get_model(
+        self,
+        fields: Fields,
+    ) -> Type[Union[BaseOrjsonModel, Record]]:
+        """Записи без проверки типов, в строгом режиме - модели pydantic"""
+        if not self.strict_models:
+            return record_model(self.model, fields)
+
+        return self._get_strict_model(fields)
+
+    def _get_strict_model(self, fields: Fields) -> Type[BaseOrjsonModel]:
+        if fields is None:
+            return self.model
+
+        return projection_model(self.model, fields)
+
+    def _get_decoders(self, fields: Fields) -> Tuple[Callable, Callable]:
+        """Декодеры записей по id и результатов поиска.
+
+        Для одних и тех же полей декодеры одни и те же,
+        чтобы локальный кеш хранил уже разобранные записи.
+        """
+        decoders = self._decoders.get(fields)
+        if decoders is None:
+            model = self._get_model(fields)
+            decoders = (
+                partial(CacheEntry.decode, load=model.parse_obj),
+                partial(
+                    CacheEntry.decode,
+                    load=partial(_load_search_result, model)
+                ),
+            )
+            self._decoders[fields] = decoders
+
+        return decoders
+
+    @staticmethod
+    def _source_params(fields: Fields) -> dict:
+        if fields is None:
+            return {}
+
+        return {'_source_includes': list(fields)}
+
+
+def _load_search_result(model: Type[BaseOrjsonModel], value: dict) -> dict:
+    return {
+        'total': value['total'],
+        'total_exact': value.get('total_exact', True),
+        'items': [model.parse_obj(item) for item in value['items']],
+        'after': value.get('after'),
+    }
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import math
+import random
+import time
+from typing import Any, Callable, Optional, Tuple
+
+import orjson
+from pydantic import BaseModel
+
+from src.models.base_model import Record
+
+# меняется вместе с форматом записей, старые ключи просто истекают
+CACHE_SCHEMA_VERSION = 3
+# значение записи идёт последним, после заголовка
+VALUE_SEPARATOR = b',"value":'
+
+
+def build_id_key(
+    index: str,
+    entity_id: str,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> str:
+    key = f'{index}:v{CACHE_SCHEMA_VERSION}:id:{entity_id}'
+    if fields is None:
+        return key
+
+    return f'{key}:fields:{_digest(",".join(fields), 8)}'
+
+
+def build_search_key(index: str, elastic_query: dict) -> str:
+    """Ключ не зависит от порядка полей в запросе и длины текста поиска"""
+    canonical = json.dumps(
+        elastic_query,
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+    )
+    return f'{index}:v{CACHE_SCHEMA_VERSION}:search:{_digest(canonical, 16)}'
+
+
+def build_total_key(index: str) -> str:
+    """Ключ точного числа документов индекса"""
+    return f'{index}:v{CACHE_SCHEMA_VERSION}:total'
+
+
+def build_suggest_key(index: str, field: str, prefix: str) -> str:
+    """Ключ подсказок для уже нормализованного префикса"""
+    return (
+        f'{index}:v{CACHE_SCHEMA_VERSION}:suggest:'
+        f'{_digest(f"{field}:{prefix}", 16)}'
+    )
+
+
+def build_tag_key(index: str, entity_id: str) -> str:
+    """Тег записей, в которых есть сущность: по id и страницы поиска"""
+    return f'{index}:v{CACHE_SCHEMA_VERSION}:tag:id:{entity_id}'
+
+
+def build_search_tag_key(index: str) -> str:
+    """Тег всех страниц поиска индекса, для новых и удалённых сущностей"""
+    return f'{index}:v{CACHE_SCHEMA_VERSION}:tag:search'
+
+
+def build_response_key(path: str, query: str) -> str:
+    """Ключ готового ответа, query уже нормализован"""
+    return f'response:v{CACHE_SCHEMA_VERSION}:{_digest(f"{path}?{query}", 16)}'
+
+
+def _digest(data: str, size: int) -> str:
+    return _digest_bytes(data.encode(), size)
+
+
+def _digest_bytes(data: bytes, size: int) -> str:
+    return hashlib.blake2b(data, digest_size=size).hexdigest()
+
+
+class RawEntity:
+    """Сущность как готовый JSON, отдаётся в ответ без сборки модели"""
+    __slots__ = ('id', 'json')
+
+    def __init__(self, entity_id: str, json: bytes) -> None:
+        self.id = entity_id
+        self.json = json
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (BaseModel, Record)):
+        return obj.dict()
+    raise TypeError
+
+
+class CacheEntry:
+    """Значение в кеше вместе со сроком свежести.
+
+    После fresh_until значение ещё отдаётся, пока его обновляют в фоне;
+    delta - сколько заняло получение значения, нужно для раннего обновления;
+    etag - хеш значения, не меняется при обновлении тем же значением.
+    """
+    __slots__ = ('value', 'fresh_until', 'delta', 'etag')
+
+    def __init__(
+        self,
+        value: Any,
+        fresh_until: float,
+        delta: float,
+        etag: Optional[str] = None,
+    ) -> None:
+        self.value = value
+        self.fresh_until = fresh_until
+        self.delta = delta
+        self.etag = etag
+
+    @classmethod
+    def create(cls, value: Any, fresh_for: int, delta: float) -> 'CacheEntry':
+        return cls(value, time.time() + fresh_for, delta)
+
+    @classmethod
+    def decode(
+        cls,
+        data: bytes,
+        load: Optional[Callable[[Any], Any]] = None,
+    ) -> Optional['CacheEntry']:
+        try:
+            raw = orjson.loads(data)
+            if raw['v'] != CACHE_SCHEMA_VERSION:
+                return None
+            value = raw['value']
+            if load is not None:
+                value = load(value)
+            return cls(
+                value,
+                raw['fresh_until'],
+                raw['delta'],
+                raw.get('etag')
+            )
+        except (ValueError, TypeError, KeyError):
+            # запись другого формата считаем промахом
+            return None
+
+    @classmethod
+    def decode_raw(
+        cls,
+        data: bytes,
+        entity_id: str,
+    ) -> Optional['CacheEntry']:
+        """Запись сущности, значение вырезается из data без разбора"""
+        start = data.find(VALUE_SEPARATOR)
+        if start < 0 or not data.endswith(b'}'):
+            return None
+        try:
+            raw = orjson.loads(data[:start] + b'}')
+            if raw['v'] != CACHE_SCHEMA_VERSION:
+                return None
+            return cls(
+                RawEntity(entity_id, data[start + len(VALUE_SEPARATOR):-1]),
+                raw['fresh_until'],
+                raw['delta'],
+                raw.get('etag')
+            )
+        except (ValueError, TypeError, KeyError):
+            return None
+
+    @staticmethod
+    def peek_etag(data: bytes) -> Optional[str]:
+        """etag записи без сборки моделей"""
+        try:
+            raw = orjson.loads(data)
+            if raw['v'] != CACHE_SCHEMA_VERSION:
+                return None
+            return raw.get('etag')
+        except (ValueError, TypeError, KeyError):
+            return None
+
+    def encode(self) -> bytes:
+        if isinstance(self.value, RawEntity):
+            value = self.value.json
+        else:
+            value = orjson.dumps(self.value, default=_default)
+        self.etag = _digest_bytes(value, 8)
+        header = orjson.dumps({
+            'v': CACHE_SCHEMA_VERSION,
+            'etag': self.etag,
+            'fresh_until': self.fresh_until,
+            'delta': self.delta,
+        })
+        # значение уже сериализовано для etag, второй раз не сериализуем
+        return header[:-1] + VALUE_SEPARATOR + value + b'}'
+
+    def should_refresh(self, beta: float) -> bool:
+        """Вероятностное раннее обновление (XFetch)"""
+        # 1 - random() лежит в (0, 1], логарифм определён
+        early = -self.delta * beta * math.log(1.0 - random.random())
+        return time.time() + early >= self.fresh_until
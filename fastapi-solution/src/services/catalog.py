@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+import orjson
+
+from src.db.async_search_engine import AsyncSearchEngine
+from src.models.base_model import BaseOrjsonModel
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+')
+
+
+def parse_order(order_by: str) -> Tuple[str, str]:
+    """'-field' - по возрастанию, 'field' - по убыванию"""
+    if order_by.startswith('-'):
+        return order_by[1:], 'asc'
+    return order_by, 'desc'
+
+
+def sort_values(entity: BaseOrjsonModel, field: str) -> list:
+    """Значения sort документа, как их вернул бы эластик"""
+    if field == 'id':
+        return [entity.id]
+    return [getattr(entity, field), entity.id]
+
+
+class CatalogSnapshot:
+    """Небольшой индекс целиком в памяти воркера.
+
+    Загружается при старте и перечитывается в фоне раз в
+    refresh_interval. Если документов больше max_size,
+    снимок не используется.
+    """
+
+    def __init__(
+        self,
+        search_engine: AsyncSearchEngine,
+        index: str,
+        model: Type[BaseOrjsonModel],
+        refresh_interval: int,
+        max_size: int,
+    ) -> None:
+        self._search_engine = search_engine
+        self._index = index
+        self._model = model
+        self._refresh_interval = refresh_interval
+        self._max_size = max_size
+        self._entities: Dict[str, BaseOrjsonModel] = {}
+        self._words: Dict[str, set] = {}
+        # отсортированные списки и позиции id в них, по order_by
+        self._sorted: Dict[str, Tuple[list, Dict[str, int]]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.loaded_at: Optional[float] = None
+        self.loads = 0
+        # хеш содержимого, одинаковый во всех воркерах
+        self.etag: Optional[str] = None
+
+    async def load(self) -> None:
+        resp = await self._search_engine.search(
+            index=self._index,
+            body={
+                'size': self._max_size,
+                'query': {'match_all': {}},
+                'track_total_hits': True,
+            }
+        )
+        total = resp['hits']['total']['value']
+        if total > self._max_size:
+            logger.warning(
+                '%s: %s documents do not fit into the catalog snapshot',
+                self._index,
+                total
+            )
+            self.loaded = False
+            return
+
+        entities = {}
+        for hit in resp['hits']['hits']:
+            entity = self._model(**hit['_source'])
+            entities[entity.id] = entity
+
+        self._entities = entities
+        self.etag = hashlib.blake2b(
+            orjson.dumps([entities[key].dict() for key in sorted(entities)]),
+            digest_size=8
+        ).hexdigest()
+        self._words = {}
+        self._sorted = {}
+        self.loaded = True
+        self.loaded_at = time.time()
+        self.loads += 1
+
+    def start_refresh(self) -> None:
+        self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def refresh(self) -> None:
+        try:
+            await self.load()
+        except Exception:
+            # продолжаем отвечать из старого снимка
+            logger.exception('%s: catalog snapshot refresh failed', self._index)
+
+    async def close(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+
+    def get(self, entity_id: str) -> Optional[BaseOrjsonModel]:
+        return self._entities.get(entity_id)
+
+    def sorted(self, order_by: str) -> Tuple[list, Dict[str, int]]:
+        """Сущности в порядке order_by с id для равных значений"""
+        cached = self._sorted.get(order_by)
+        if cached is None:
+            field, order = parse_order(order_by)
+            entities = sorted(self._entities.values(), key=lambda e: e.id)
+            if field != 'id':
+                entities.sort(
+                    key=lambda e: getattr(e, field),
+                    reverse=order == 'desc'
+                )
+            elif order == 'desc':
+                entities.reverse()
+            cached = (
+                entities,
+                {entity.id: position for position, entity in enumerate(entities)}
+            )
+            self._sorted[order_by] = cached
+
+        return cached
+
+    def match(self, field: str, text: str) -> List[BaseOrjsonModel]:
+        """Сущности, в поле field которых есть хотя бы одно слово text.
+
+        Сначала те, где совпало больше слов.
+        """
+        words = set(WORD_RE.findall(text.lower()))
+        scored = []
+        for entity in self._entities.values():
+            score = len(words & self._entity_words(entity, field))
+            if score:
+                scored.append((-score, entity.id, entity))
+
+        return [entity for _, _, entity in sorted(scored, key=lambda s: s[:2])]
+
+    def stats(self) -> dict:
+        return {
+            'loaded': self.loaded,
+            'loaded_at': self.loaded_at,
+            'loads': self.loads,
+            'entities': len(self._entities),
+        }
+
+    def _entity_words(self, entity: BaseOrjsonModel, field: str) -> set:
+        key = f'{field}:{entity.id}'
+        words = self._words.get(key)
+        if words is None:
+            words = set(WORD_RE.findall(str(getattr(entity, field) or '').lower()))
+            self._words[key] = words
+        return words
+
+    async def _refresh(self) -> None:
+        while True:
+            await asyncio.sleep(self._refresh_interval)
+            await self.refresh()
+
+
+genre_catalog: Optional[CatalogSnapshot] = None
+
+
+async def get_genre_catalog() -> Optional[CatalogSnapshot]:
+    return genre_catalog
@@ -0,0 +1,118 @@
+import hashlib
+from contextvars import ContextVar
+from typing import Iterable, List, Optional
+
+# ETag сравнивается только с ETag ответа на тот же url
+MISSING = 'missing'
+
+
+class NotModified(Exception):
+    """Ответ совпал с If-None-Match, тело можно не собирать"""
+
+    def __init__(self, etag: str) -> None:
+        self.etag = etag
+
+
+class RequestETags:
+    """ETag записей кеша, из которых собран ответ на запрос.
+
+    Если ответ будет сохранён целиком, собираются и теги записей,
+    чтобы инвалидация удаляла и его.
+    """
+    __slots__ = ('if_none_match', 'etags', 'tags')
+
+    def __init__(
+        self,
+        if_none_match: Optional[str],
+        collect_tags: bool = False,
+    ) -> None:
+        self.if_none_match = _parse_if_none_match(if_none_match)
+        # None - часть ответа собрана не из кеша, ETag неизвестен
+        self.etags: Optional[List[str]] = []
+        self.tags: Optional[set] = set() if collect_tags else None
+
+    def response_etag(self) -> Optional[str]:
+        if not self.etags:
+            return None
+        if len(self.etags) == 1:
+            return _format(self.etags[0])
+
+        digest = hashlib.blake2b(
+            '\n'.join(self.etags).encode(),
+            digest_size=8
+        ).hexdigest()
+        return _format(digest)
+
+    def matches(self, etag: str) -> bool:
+        return '*' in self.if_none_match or _opaque(etag) in self.if_none_match
+
+
+_request_etags: ContextVar[Optional[RequestETags]] = ContextVar(
+    'request_etags',
+    default=None
+)
+
+
+def start(
+    if_none_match: Optional[str],
+    collect_tags: bool = False,
+) -> RequestETags:
+    state = RequestETags(if_none_match, collect_tags)
+    _request_etags.set(state)
+    return state
+
+
+def current() -> Optional[RequestETags]:
+    return _request_etags.get()
+
+
+def collects_tags() -> bool:
+    state = _request_etags.get()
+    return state is not None and state.tags is not None
+
+
+def record_tags(tags: Iterable[str]) -> None:
+    state = _request_etags.get()
+    if state is not None and state.tags is not None:
+        state.tags.update(tags)
+
+
+def expects_match() -> bool:
+    state = _request_etags.get()
+    return state is not None and bool(state.if_none_match)
+
+
+def check(etag: Optional[str]) -> None:
+    """Ответ из одной записи с тем же ETag: 304 без разбора записи"""
+    state = _request_etags.get()
+    if state is None or etag is None or state.etags != []:
+        return
+    if state.matches(etag):
+        raise NotModified(_format(etag))
+
+
+def record(etag: Optional[str]) -> None:
+    state = _request_etags.get()
+    if state is None or state.etags is None:
+        return
+    if etag is None:
+        state.etags = None
+    else:
+        state.etags.append(etag)
+
+
+def _format(etag: str) -> str:
+    return f'W/"{etag}"'
+
+
+def _opaque(etag: str) -> str:
+    etag = etag.strip()
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return etag.strip('"')
+
+
+def _parse_if_none_match(header: Optional[str]) -> set:
+    if not header:
+        return set()
+    return {_opaque(etag) for etag in header.split(',') if etag.strip()}
@@ -1,88 +1,68 @@
-import json
-from functools import lru_cache
-from typing import Optional, Union
+from functools import lru_cache, partial
+from typing import Optional, Sequence
 
-from elasticsearch import NotFoundError
 from fastapi import Depends
 
+from src.core.config import cache_settings, search_settings
 from src.db.async_search_engine import get_elastic_engine, AsyncSearchEngine
 from src.db.async_cache_storage import get_redis, AsyncCacheStorage
 from src.models.film import Film
-from .utils import get_result
-
-FILM_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
+from .base import BaseService, Fields
+from .cache import CacheEntry, build_search_key
+
+FILM_CACHE_EXPIRE_IN_SECONDS = cache_settings.film_expire  # 5 минут по умолчанию
+FILM_CACHE_STALE_IN_SECONDS = cache_settings.film_stale
+FILM_FACETS_CACHE_EXPIRE_IN_SECONDS = cache_settings.facets_expire
+
+RATING_INTERVAL = 1
+GENRE_FIELD = search_settings.facets_genre_field
+FILM_FACETS_AGGS = {
+    'genre': {'terms': {'field': GENRE_FIELD, 'size': 100}},
+    'imdb_rating': {
+        'histogram': {
+            'field': 'imdb_rating',
+            'interval': RATING_INTERVAL,
+            'min_doc_count': 0,
+            'extended_bounds': {'min': 0, 'max': 10 - RATING_INTERVAL},
+        }
+    },
+    'age_limit': {
+        'terms': {'field': 'age_limit', 'size': 20, 'order': {'_key': 'asc'}}
+    },
+}
 
 
-class FilmService:
-    FILM_BY_ID_KEY_TEMPLATE = 'film_id_{0}'
-    SEARCH_FILM_KEY_TEMPLATE = 'search_film_query_params_{0}'
+class FilmService(BaseService):
+    index = 'movies'
+    model = Film
+    cache_expire = FILM_CACHE_EXPIRE_IN_SECONDS
+    cache_stale = FILM_CACHE_STALE_IN_SECONDS
 
-    def __init__(
+    async def get_films(
         self,
-        cache: AsyncCacheStorage,
-        search_engine: AsyncSearchEngine,
-    ) -> None:
-        self._cache = cache
-        self._search_engine = search_engine
-
-    async def get_by_id(self, film_id: str) -> Optional[Film]:
-        film = await self._film_from_cache(film_id)
-        if not film:
-            film = await self._get_film_from_elastic(film_id)
-            if not film:
-                return None
-
-            await self._put_film_to_cache(film)
-        return film
-
-    async def get_films(self, page_size: int = 10, page_number: int = 0, order_by: str = 'imdb_rating'):
+        page_size: int = 10,
+        page_number: int = 0,
+        order_by: str = 'imdb_rating',
+        fields: Fields = None,
+        cursor: Optional[dict] = None,
+        snapshot: bool = False
+    ):
         """фильмы с пагинацией, сортировка по рейтингу"""
-        order = 'desc'
-        if order_by.startswith('-'):
-            order = 'asc'
-            order_by = order_by[1:]
-
-        elastic_query = {
-            "size": page_size,
-            "from": page_number * page_size,
-            "sort": [
-                {
-                    order_by: {
-                        "order": order,
-                    }
-                }
-            ]
-        }
-        data = await self._get_search_result_from_cache(
-            f'films_{str(elastic_query)}',
-        )
-        if data:
-            return get_result(
-                data,
-                page_size,
-                page_number,
-                Film
-            )
-        resp = await self._search_engine.search(
-            index='movies',
-            body=elastic_query
-        )
-        await self._put_search_result_to_cache(
-            f'films_{str(elastic_query)}',
-            resp,
-        )
-        return get_result(
-            resp,
+        return await self._sorted_search(
+            order_by,
             page_size,
             page_number,
-            Film
+            fields,
+            cursor,
+            snapshot
         )
 
     async def get_by_search_word(
         self,
         search_word: str,
         page_size: int = 10,
-        page_number: int = 0
+        page_number: int = 0,
+        fields: Fields = None
     ):
         """поиск по слову"""
         elastic_query = {
@@ -96,74 +76,65 @@ class FilmService:
                 }
             }
         }
-
-        data = await self._get_search_result_from_cache(
-            str(elastic_query)
-        )
-        if data:
-            return get_result(data, page_size, page_number, Film)
-        resp = await self._search_engine.search(
-            index='movies',
-            body=elastic_query
-        )
-        await self._put_search_result_to_cache(
-            str(elastic_query),
-            resp,
-        )
-        return get_result(resp, page_size, page_number, Film)
-
-    async def _get_film_from_elastic(self, film_id: str) -> Optional[Film]:
-        try:
-            film = await self._search_engine.get(
-                'movies',
-                film_id
-            )
-        except NotFoundError:
-            return None
-
-        return Film(**film['_source'])
-
-    async def _film_from_cache(
-        self,
-        film_id: str
-    ) -> Optional[Film]:
-        data = await self._cache.get(
-            self.FILM_BY_ID_KEY_TEMPLATE.format(film_id)
-        )
-        if not data:
-            return None
-        film = Film.parse_raw(data)
-        return film
-
-    async def _get_search_result_from_cache(
-        self,
-        key: str,
-    ) -> Union[str, None]:
-        data = await self._cache.get(
-            self.SEARCH_FILM_KEY_TEMPLATE.format(key)
+        return await self._search(
+            elastic_query,
+            page_size,
+            page_number,
+            fields
         )
-        if not data:
-            return None
-
-        return json.loads(data.decode('utf-8'))
 
-    async def _put_search_result_to_cache(
+    async def get_facets(
         self,
-        key: str,
-        search_result: str,
-    ):
-        await self._cache.set(
-            self.SEARCH_FILM_KEY_TEMPLATE.format(key),
-            json.dumps(search_result),
-            expire=FILM_CACHE_EXPIRE_IN_SECONDS,
+        genres: Sequence[str] = (),
+        min_rating: Optional[float] = None,
+    ) -> dict:
+        """Число фильмов по жанрам, рейтингу и возрастному ограничению.
+
+        Одна агрегация без документов, в кеше - по набору фильтров.
+        """
+        filters = [
+            {'term': {GENRE_FIELD: genre}} for genre in sorted(set(genres))
+        ]
+        if min_rating is not None:
+            filters.append({'range': {'imdb_rating': {'gte': min_rating}}})
+        elastic_query = {
+            'size': 0,
+            'track_total_hits': True,
+            'query': {'bool': {'filter': filters}},
+            'aggs': FILM_FACETS_AGGS,
+        }
+        return await self._cached(
+            build_search_key(self.index, elastic_query),
+            partial(self._facets_in_elastic, elastic_query),
+            CacheEntry.decode,
+            expire=FILM_FACETS_CACHE_EXPIRE_IN_SECONDS
         )
 
-    async def _put_film_to_cache(self, film: Film):
-        await self._cache.set(
-            self.FILM_BY_ID_KEY_TEMPLATE.format(film.id),
-            film.json(),
-            expire=FILM_CACHE_EXPIRE_IN_SECONDS
+    async def _facets_in_elastic(self, elastic_query: dict) -> dict:
+        resp = await self._search_engine.search(
+            index=self.index,
+            body=elastic_query
         )
+        aggs = resp['aggregations']
+        return {
+            'total': resp['hits']['total']['value'],
+            'genre': [
+                {'value': bucket['key'], 'count': bucket['doc_count']}
+                for bucket in aggs['genre']['buckets']
+            ],
+            'imdb_rating': [
+                {
+                    'from': bucket['key'],
+                    'to': bucket['key'] + RATING_INTERVAL,
+                    'count': bucket['doc_count'],
+                }
+                for bucket in aggs['imdb_rating']['buckets']
+            ],
+            'age_limit': [
+                {'value': bucket['key'], 'count': bucket['doc_count']}
+                for bucket in aggs['age_limit']['buckets']
+            ],
+        }
 
 
 @lru_cache()
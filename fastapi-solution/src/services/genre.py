@@ -1,104 +1,123 @@
 from functools import lru_cache
-from typing import Optional, Union
-import json
+from typing import List, Optional, Union
 
-from elasticsearch import NotFoundError
 from fastapi import Depends
-from .utils import get_result
 
+from src.core.config import cache_settings
 from src.db.async_search_engine import get_elastic_engine, AsyncSearchEngine
 from src.db.async_cache_storage import get_redis, AsyncCacheStorage
 from src.models.genre import Genre
+from . import etag
+from .base import BaseService, Fields
+from .cache import build_search_tag_key, build_tag_key
+from .catalog import CatalogSnapshot, get_genre_catalog, sort_values
+from .utils import get_result
 
-GENRE_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
+GENRE_CACHE_EXPIRE_IN_SECONDS = cache_settings.genre_expire  # 5 минут по умолчанию
+GENRE_CACHE_STALE_IN_SECONDS = cache_settings.genre_stale
 
 
-class GenersService:
-    GENRE_BY_ID_KEY_TEMPLATE = 'genre_id_{0}'
-    SEARCH_GENRE_KEY_TEMPLATE = 'search_genre_query_params_{0}'
+class GenersService(BaseService):
+    """Жанры из снимка каталога в памяти, без снимка - как остальные сервисы"""
+    index = 'genres'
+    model = Genre
+    cache_expire = GENRE_CACHE_EXPIRE_IN_SECONDS
+    cache_stale = GENRE_CACHE_STALE_IN_SECONDS
 
     def __init__(
         self,
         cache: AsyncCacheStorage,
         search_engine: AsyncSearchEngine,
+        catalog: Optional[CatalogSnapshot] = None,
     ) -> None:
-        self._cache = cache
-        self._search_engine = search_engine
+        super().__init__(cache, search_engine)
+        self._catalog = catalog
 
-    async def get_by_id(self, genre_id: str) -> Optional[Genre]:
-        genre = await self._genre_from_cache(genre_id)
-        if not genre:
-            genre = await self._get_genre_from_elastic(genre_id)
-            if not genre:
-                return None
+    async def get_by_id(
+        self,
+        entity_id: str,
+        fields: Fields = None,
+    ) -> Optional[Genre]:
+        if self._catalog_loaded():
+            genre = self._catalog.get(entity_id)
+            if genre is not None:
+                self._record_catalog_etag([genre])
+                return self._project(genre, fields)
 
-            await self._put_genre_to_cache(genre)
-        return genre
+        # жанр мог появиться после загрузки снимка
+        return await super().get_by_id(entity_id, fields)
+
+    async def get_by_ids(
+        self,
+        entity_ids: List[str],
+        fields: Fields = None,
+    ) -> List[Optional[Genre]]:
+        if self._catalog_loaded():
+            genres = [self._catalog.get(genre_id) for genre_id in entity_ids]
+            if all(genres):
+                etag.record(self._catalog.etag)
+                if etag.collects_tags():
+                    etag.record_tags(
+                        build_tag_key(self.index, genre_id)
+                        for genre_id in entity_ids
+                    )
+                return [self._project(genre, fields) for genre in genres]
+
+        return await super().get_by_ids(entity_ids, fields)
 
     async def get_genres(
         self,
         page_size: int = 10,
         page_number: int = 0,
-        order_by: str = 'id'
+        order_by: str = 'id',
+        fields: Fields = None,
+        cursor: Optional[dict] = None,
+        snapshot: bool = False
     ) -> Union[dict, None]:
-        order = 'desc'
-        if order_by.startswith('-'):
-            order = 'asc'
-            order_by = order_by[1:]
-
-        elastic_query = {
-            'size': page_size,
-            'from': page_number * page_size,
-            'sort': [
-                {
-                    order_by: {
-                        'order': order,
-                    }
-                }
-            ]
-        }
-        data = await self._get_search_result_from_cache(
-            str(elastic_query),
-        )
-        if data:
-            return get_result(
-                data,
-                page_size,
-                page_number,
-                Genre
-            )
-        resp = await self._search_engine.search(
-            index='genres',
-            body=elastic_query
-        )
-        await self._put_search_result_to_cache(
-            str(elastic_query),
-            resp,
-        )
-        return get_result(
-            resp,
+        # листание по снимку индекса остаётся в эластике
+        if self._catalog_loaded() and not snapshot:
+            if cursor is not None:
+                order_by = cursor['sort']
+            genres, positions = self._catalog.sorted(order_by)
+            start = page_number * page_size
+            if cursor is not None:
+                start = positions.get(cursor['after'][-1], -1) + 1
+            # без жанра из курсора продолжить можно только в эластике
+            if cursor is None or start:
+                return self._catalog_page(
+                    genres,
+                    start,
+                    page_size,
+                    page_number,
+                    fields,
+                    order_by
+                )
+
+        return await self._sorted_search(
+            order_by,
             page_size,
             page_number,
-            Genre
-        )
-
-    async def _put_search_result_to_cache(
-        self,
-        key: str,
-        search_result: str,
-    ):
-        await self._cache.set(
-            self.SEARCH_GENRE_KEY_TEMPLATE.format(key),
-            json.dumps(search_result),
-            expire=GENRE_CACHE_EXPIRE_IN_SECONDS,
+            fields,
+            cursor,
+            snapshot
         )
 
     async def get_by_search_word(
         self,
         search_word: str,
         page_size: int = 10,
-        page_number: int = 0
+        page_number: int = 0,
+        fields: Fields = None
     ) -> dict:
+        if self._catalog_loaded():
+            return self._catalog_page(
+                self._catalog.match('title', search_word),
+                page_number * page_size,
+                page_size,
+                page_number,
+                fields
+            )
+
         elastic_query = {
             'size': page_size,
             'from': page_number * page_size,
@@ -110,79 +129,66 @@ class GenersService:
                 }
             }
         }
-
-        data = await self._get_search_result_from_cache(
-            str(elastic_query)
-        )
-        if data:
-            return get_result(
-                data,
-                page_size,
-                page_number,
-                Genre
-            )
-        resp = await self._search_engine.search(
-            index='genres',
-            body=elastic_query
-        )
-        await self._put_search_result_to_cache(
-            str(elastic_query),
-            resp,
-        )
-        return get_result(
-            resp,
+        return await self._search(
+            elastic_query,
             page_size,
             page_number,
-            Genre
+            fields
         )
 
-    async def _get_search_result_from_cache(
-        self,
-        key: str,
-    ) -> Union[dict, None]:
-        data = await self._cache.get(
-            self.SEARCH_GENRE_KEY_TEMPLATE.format(key)
-        )
-        if not data:
-            return None
+    def _catalog_loaded(self) -> bool:
+        return self._catalog is not None and self._catalog.loaded
 
-        return json.loads(data)
-    
-    async def _get_genre_from_elastic(
+    def _catalog_page(
         self,
-        genre_id: str
-    ) -> Optional[Genre]:
-        try:
-            genre = await self._search_engine.get(
-                'genres',
-                genre_id
-            )
-        except NotFoundError:
-            return None
-
-        return Genre(**genre['_source'])
+        genres: List[Genre],
+        start: int,
+        page_size: int,
+        page_number: int,
+        fields: Fields,
+        order_by: Optional[str] = None,
+    ) -> dict:
+        page = genres[start:start + page_size]
+        self._record_catalog_etag(page, search=True)
+        after = None
+        if order_by is not None and page:
+            after = sort_values(page[-1], order_by.lstrip('-'))
 
-    async def _genre_from_cache(self, genre_id: str) -> Optional[Genre]:
-        data = await self._cache.get(
-            self.GENRE_BY_ID_KEY_TEMPLATE.format(genre_id)
+        return get_result(
+            {
+                'total': len(genres),
+                'items': [self._project(genre, fields) for genre in page],
+                'after': after,
+            },
+            page_size,
+            page_number,
+            order_by
         )
-        if not data:
-            return None
 
-        genre = Genre.parse_raw(data)
-        return genre
+    def _record_catalog_etag(
+        self,
+        genres: List[Genre],
+        search: bool = False,
+    ) -> None:
+        """Ответ из снимка не меняется, пока не перечитан снимок"""
+        etag.check(self._catalog.etag)
+        etag.record(self._catalog.etag)
+        if etag.collects_tags():
+            etag.record_tags(build_tag_key(self.index, g.id) for g in genres)
+            if search:
+                etag.record_tags([build_search_tag_key(self.index)])
+
+    def _project(self, genre: Genre, fields: Fields) -> Genre:
+        if fields is None:
+            return genre
 
-    async def _put_genre_to_cache(self, genre: Genre):
-        await self._cache.set(
-            self.GENRE_BY_ID_KEY_TEMPLATE.format(genre.id),
-            genre.json(),
-            expire=GENRE_CACHE_EXPIRE_IN_SECONDS
-        )
+        return self._get_model(fields)(**genre.dict(include=set(fields)))
 
 
 @lru_cache()
 def get_genre_service(
     cache: AsyncCacheStorage = Depends(get_redis),
     search_engine: AsyncSearchEngine = Depends(get_elastic_engine),
+    catalog: Optional[CatalogSnapshot] = Depends(get_genre_catalog),
 ) -> GenersService:
-    return GenersService(cache, search_engine)
+    return GenersService(cache, search_engine, catalog)
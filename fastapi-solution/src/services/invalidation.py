@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import orjson
+
+from src.db.async_cache_storage import AsyncCacheStorage
+from .cache import build_search_tag_key, build_tag_key
+from .catalog import CatalogSnapshot
+
+logger = logging.getLogger(__name__)
+
+# ETL -> сервис: {"index": "movies", "ids": ["..."], "lists": false}
+CHANGES_CHANNEL = 'cache:changes'
+# воркер, удаливший ключи из redis -> все воркеры: {"index": ..., "keys": [...]}
+EVICTED_CHANNEL = 'cache:evicted'
+
+
+class CacheInvalidator:
+    """Удаляет из кеша записи с изменившимися сущностями.
+
+    Каждая запись помечена тегами с id сущностей в ней,
+    так что удаляются только затронутые ключи. Локальные
+    кеши воркеров и снимки каталогов обновляются по сообщению
+    в EVICTED_CHANNEL.
+    """
+
+    def __init__(
+        self,
+        cache: AsyncCacheStorage,
+        catalogs: Dict[str, CatalogSnapshot],
+    ) -> None:
+        self._cache = cache
+        self._catalogs = catalogs
+        self._tasks: List[asyncio.Task] = []
+        self.invalidations = 0
+        self.evicted_keys = 0
+
+    async def invalidate(
+        self,
+        index: str,
+        ids: List[str],
+        lists: bool = False,
+    ) -> int:
+        """lists - удалить и все страницы поиска индекса,
+        например, если сущность добавлена или удалена"""
+        keys = await self._pop(index, ids, lists)
+        await self._publish_evicted(index, keys)
+        return len(keys)
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.ensure_future(
+                self._consume(CHANGES_CHANNEL, self._on_changes)
+            ),
+            asyncio.ensure_future(
+                self._consume(EVICTED_CHANNEL, self._on_evicted)
+            ),
+        ]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            'invalidations': self.invalidations,
+            'evicted_keys': self.evicted_keys,
+        }
+
+    async def _on_changes(self, message: dict) -> None:
+        """Изменения получают все воркеры, а ключи из redis достаются одному"""
+        index = message['index']
+        keys = await self._pop(
+            index,
+            message.get('ids', []),
+            message.get('lists', False)
+        )
+        if keys:
+            await self._publish_evicted(index, keys)
+        else:
+            await self._refresh_catalog(index)
+
+    async def _on_evicted(self, message: dict) -> None:
+        self._cache.forget(message['keys'])
+        self.evicted_keys += len(message['keys'])
+        await self._refresh_catalog(message['index'])
+
+    async def _pop(self, index: str, ids: List[str], lists: bool) -> List[str]:
+        tags = [build_tag_key(index, entity_id) for entity_id in ids]
+        if lists:
+            tags.append(build_search_tag_key(index))
+
+        self.invalidations += 1
+        return await self._cache.pop_tagged(tags)
+
+    async def _publish_evicted(self, index: str, keys: List[str]) -> None:
+        # воркеры забывают ключи в локальных кешах и обновляют снимки
+        await self._cache.publish(
+            EVICTED_CHANNEL,
+            orjson.dumps({'index': index, 'keys': keys})
+        )
+
+    async def _refresh_catalog(self, index: str) -> None:
+        catalog = self._catalogs.get(index)
+        if catalog is not None:
+            await catalog.refresh()
+
+    async def _consume(self, channel: str, handler) -> None:
+        while True:
+            try:
+                async for data in self._cache.listen(channel):
+                    try:
+                        await handler(orjson.loads(data))
+                    except Exception:
+                        logger.exception('bad message in %s: %r', channel, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('%s subscription failed, resubscribing', channel)
+                await asyncio.sleep(1)
+
+
+cache_invalidator: Optional[CacheInvalidator] = None
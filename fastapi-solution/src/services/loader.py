@@ -0,0 +1,97 @@
+import asyncio
+from functools import partial
+from typing import Dict, List, Optional, Sequence
+
+from src.models.base_model import BaseOrjsonModel
+from .base import BaseService, Fields
+
+
+class EntityLoader:
+    """Загрузка сущностей по id пачками в пределах одного запроса.
+
+    Все load, вызванные до следующего шага цикла событий,
+    уходят одним get_by_ids: один MGET в кеш и один mget в эластик
+    на промахи. Загруженное запоминается до конца запроса.
+    """
+
+    def __init__(self, service: BaseService, fields: Fields = None) -> None:
+        self._service = service
+        self._fields = fields
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._queue: List[str] = []
+        self.batches = 0
+
+    def load(self, entity_id: str) -> asyncio.Future:
+        future = self._futures.get(entity_id)
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = loop.create_future()
+            self._futures[entity_id] = future
+            if not self._queue:
+                loop.call_soon(self._dispatch)
+            self._queue.append(entity_id)
+
+        return future
+
+    async def load_many(
+        self,
+        entity_ids: Sequence[str],
+    ) -> List[Optional[BaseOrjsonModel]]:
+        return list(await asyncio.gather(*map(self.load, entity_ids)))
+
+    def _dispatch(self) -> None:
+        entity_ids, self._queue = self._queue, []
+        self.batches += 1
+        task = asyncio.ensure_future(
+            self._service.get_by_ids(entity_ids, self._fields)
+        )
+        task.add_done_callback(partial(self._resolve, entity_ids))
+
+    def _resolve(self, entity_ids: List[str], task: asyncio.Future) -> None:
+        error = None if task.cancelled() else task.exception()
+        for index, entity_id in enumerate(entity_ids):
+            future = self._futures[entity_id]
+            # ожидающий запрос мог быть отменён
+            if future.done():
+                continue
+            if task.cancelled():
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(task.result()[index])
+
+
+async def expand_refs(
+    items: List[dict],
+    fields: Sequence[str],
+    loader: EntityLoader,
+) -> None:
+    """Заменяет ссылки {id, name} в полях fields на сущности из loader.
+
+    Ссылки всех items загружаются одной пачкой, ненайденные
+    остаются как есть. Списки ссылок не меняются на месте:
+    они общие с записями в локальном кеше.
+    """
+    async def expand_field(item: dict, field: str) -> None:
+        refs = item.get(field) or []
+        ids = [
+            ref['id'] for ref in refs
+            if isinstance(ref, dict) and ref.get('id')
+        ]
+        if not ids:
+            return
+
+        entities = dict(zip(ids, await loader.load_many(ids)))
+        item[field] = [
+            {**ref, **entities[ref['id']].dict(exclude_unset=True)}
+            if isinstance(ref, dict) and entities.get(ref.get('id'))
+            else ref
+            for ref in refs
+        ]
+
+    await asyncio.gather(*(
+        expand_field(item, field)
+        for item in items
+        for field in fields
+    ))
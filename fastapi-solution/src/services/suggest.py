@@ -0,0 +1,242 @@
+import re
+import time
+from functools import lru_cache, partial
+from typing import List, Optional, Tuple
+
+from fastapi import Depends
+
+from src.core import metrics
+from src.core.config import cache_settings, suggest_settings
+from src.core.singleflight import SingleFlight
+from src.db.async_cache_storage import get_redis, AsyncCacheStorage
+from src.db.async_search_engine import get_elastic_engine, AsyncSearchEngine
+from . import etag
+from .cache import (
+    CacheEntry,
+    build_search_tag_key,
+    build_suggest_key,
+    build_tag_key,
+)
+
+# слова как у standard analyzer эластика, с апострофом внутри слова
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+
+# порядок не зависит от префикса, поэтому отбор из списка
+# короткого префикса даёт тот же порядок, что и эластик
+FILM_SUGGEST_SORT = (
+    {'imdb_rating': {'order': 'desc'}},
+    {'id': {'order': 'asc'}},
+)
+PERSON_SUGGEST_SORT = ({'id': {'order': 'asc'}},)
+
+
+def normalize_prefix(prefix: str) -> str:
+    return ' '.join(prefix.lower().split())
+
+
+def matches(text: Optional[str], terms: List[str]) -> bool:
+    """Как match_bool_prefix с operator=and: все слова, кроме
+    последнего, целиком, последнее - как начало слова"""
+    words = TOKEN_RE.findall((text or '').lower())
+    *whole, last = terms
+    return (
+        all(term in words for term in whole)
+        and any(word.startswith(last) for word in words)
+    )
+
+
+class SuggestService:
+    """Подсказки при наборе: id и название по началу слов.
+
+    Совпадения префикса кешируются вместе с признаком полноты.
+    Если у более короткого префикса в кеше все совпадения,
+    подсказки для длинного отбираются из них без эластика.
+    """
+
+    def __init__(
+        self,
+        cache: AsyncCacheStorage,
+        search_engine: AsyncSearchEngine,
+        index: str,
+        field: str,
+        sort: Tuple[dict, ...],
+        min_length: int,
+        pool_size: int,
+        expire: int,
+        tag_expire: int,
+    ) -> None:
+        self._cache = cache
+        self._search_engine = search_engine
+        self._index = index
+        self._field = field
+        # подполе с edge-ngram хранится в _source под именем поля
+        self._source_field = field.split('.')[0]
+        self._sort = list(sort)
+        self._min_length = min_length
+        self._pool_size = pool_size
+        self._expire = expire
+        # теги общие с записями сервиса, сокращать их жизнь нельзя
+        self._tag_expire = tag_expire
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.derived = 0
+        self.searches = 0
+        metrics.register(f'{index}_suggest', self.stats)
+
+    async def suggest(self, prefix: str, limit: int) -> List[dict]:
+        prefix = normalize_prefix(prefix)
+        terms = TOKEN_RE.findall(prefix)
+        if len(prefix) < self._min_length or not terms:
+            return []
+
+        # сам префикс и более короткие - одним MGET
+        prefixes = [
+            prefix[:end]
+            for end in range(len(prefix), self._min_length - 1, -1)
+            if not prefix[:end].endswith(' ')
+        ]
+        keys = [
+            build_suggest_key(self._index, self._field, shorter)
+            for shorter in prefixes
+        ]
+        entries = await self._cache.get_many_decoded(keys, CacheEntry.decode)
+
+        entry = entries[0]
+        if entry is not None:
+            self.hits += 1
+        else:
+            complete = next(
+                (
+                    shorter for shorter in entries[1:]
+                    if shorter is not None and shorter.value['complete']
+                ),
+                None
+            )
+            if complete is not None:
+                self.derived += 1
+                entry = await self._derive(keys[0], terms, complete)
+            else:
+                entry = await self._flight.do(
+                    keys[0],
+                    partial(self._search, keys[0], prefix)
+                )
+
+        etag.record(entry.etag)
+        if etag.collects_tags():
+            etag.record_tags(self._tags(entry.value['items']))
+        return entry.value['items'][:limit]
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'derived': self.derived,
+            'searches': self.searches,
+        }
+
+    async def _search(self, key: str, prefix: str) -> CacheEntry:
+        self.searches += 1
+        started = time.monotonic()
+        resp = await self._search_engine.search(
+            index=self._index,
+            body={
+                'size': self._pool_size,
+                '_source': ['id', self._source_field],
+                'query': {
+                    'match_bool_prefix': {
+                        self._field: {'query': prefix, 'operator': 'and'}
+                    }
+                },
+                'sort': self._sort,
+                # точное число нужно только до границы полноты
+                'track_total_hits': self._pool_size + 1,
+            }
+        )
+        # id строкой, как у остальных эндпоинтов
+        items = [
+            {
+                'id': str(hit['_source']['id']),
+                self._source_field: hit['_source'].get(self._source_field),
+            }
+            for hit in resp['hits']['hits']
+        ]
+        return await self._save(
+            key,
+            items,
+            resp['hits']['total']['value'] <= len(items),
+            time.monotonic() - started
+        )
+
+    async def _derive(
+        self,
+        key: str,
+        terms: List[str],
+        complete: CacheEntry,
+    ) -> CacheEntry:
+        items = [
+            item for item in complete.value['items']
+            if matches(item[self._source_field], terms)
+        ]
+        return await self._save(key, items, True, complete.delta)
+
+    async def _save(
+        self,
+        key: str,
+        items: List[dict],
+        complete: bool,
+        delta: float,
+    ) -> CacheEntry:
+        entry = CacheEntry.create(
+            {'items': items, 'complete': complete},
+            self._expire,
+            delta
+        )
+        await self._cache.set_tagged(
+            {key: entry.encode()},
+            {tag: [key] for tag in self._tags(items)},
+            expire=self._expire,
+            tag_expire=self._tag_expire
+        )
+        return entry
+
+    def _tags(self, items: List[dict]) -> List[str]:
+        # новые сущности сбрасывают подсказки вместе со страницами поиска
+        return [
+            build_search_tag_key(self._index),
+            *(build_tag_key(self._index, item['id']) for item in items),
+        ]
+
+
+@lru_cache()
+def get_film_suggest_service(
+    cache: AsyncCacheStorage = Depends(get_redis),
+    search_engine: AsyncSearchEngine = Depends(get_elastic_engine),
+) -> SuggestService:
+    return SuggestService(
+        cache,
+        search_engine,
+        index='movies',
+        field=suggest_settings.film_field,
+        sort=FILM_SUGGEST_SORT,
+        min_length=suggest_settings.min_length,
+        pool_size=suggest_settings.pool_size,
+        expire=suggest_settings.expire,
+        tag_expire=cache_settings.film_expire + cache_settings.film_stale,
+    )
+
+
+@lru_cache()
+def get_person_suggest_service(
+    cache: AsyncCacheStorage = Depends(get_redis),
+    search_engine: AsyncSearchEngine = Depends(get_elastic_engine),
+) -> SuggestService:
+    return SuggestService(
+        cache,
+        search_engine,
+        index='person',
+        field=suggest_settings.person_field,
+        sort=PERSON_SUGGEST_SORT,
+        min_length=suggest_settings.min_length,
+        pool_size=suggest_settings.pool_size,
+        expire=suggest_settings.expire,
+        tag_expire=cache_settings.person_expire + cache_settings.person_stale,
+    )
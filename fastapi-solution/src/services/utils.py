@@ -1,14 +1,36 @@
-from fastapi import Query
+import base64
+import binascii
+from http import HTTPStatus
+from typing import List, Optional, Tuple, Type
 
+import orjson
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, Field
 
-def create_pagination(resp, page_size, page_number):
-    total_entities_count = resp['hits']['total']['value']
+from src.core.constants import INVALID_CURSOR_MESS
+
+BATCH_MAX_SIZE = 100
+# значения sort из курсора уходят в search_after как есть
+CURSOR_VALUE_TYPES = (str, int, float, type(None))
+
+
+def create_pagination(
+    total_entities_count,
+    page_size,
+    page_number,
+    lower_bound=False
+):
+    """lower_bound - эластик перестал считать на пороге, страниц может быть больше"""
     last_page = int(total_entities_count) // page_size - 1 if int(
         total_entities_count) % page_size == 0 else int(total_entities_count) // page_size
-    next_page = page_number + 1 if page_number < last_page else None
+    if lower_bound:
+        last_page = max(last_page, page_number)
+    next_page = page_number + 1 if page_number < last_page or lower_bound else None
     prev_page = page_number - 1 if (page_number - 1) >= 0 else None
 
     pagination_info = {'first': 0, 'last': last_page}
+    if lower_bound:
+        pagination_info['last_is_lower_bound'] = True
 
     if prev_page:
         pagination_info['prev'] = prev_page
@@ -18,17 +40,86 @@ def create_pagination(resp, page_size, page_number):
     return {'pagination': pagination_info, 'result': []}
 
 
-def get_result(resp, page_size, page_number, model):
-    """парсим ответ от эластика"""
-    result = create_pagination(resp, page_size, page_number)
+def get_result(search_result, page_size, page_number, sort=None):
+    """страница результатов поиска с пагинацией
+
+    Для отсортированных списков в пагинацию добавляется курсор
+    следующей страницы.
+    """
+    lower_bound = not search_result.get('total_exact', True)
+    result = create_pagination(
+        search_result['total'],
+        page_size,
+        page_number,
+        lower_bound
+    )
+    result['result'].extend(search_result['items'])
+    if lower_bound and len(search_result['items']) < page_size:
+        # неполная страница - последняя, сколько бы ни насчитал эластик
+        result['pagination'].pop('next', None)
 
-    items = resp['hits']['hits']
-    for item in items:
-        result['result'].append(model(**item['_source']))
+    after = search_result.get('after')
+    if sort is not None and after and 'next' in result['pagination']:
+        result['pagination']['next_cursor'] = encode_cursor(
+            sort, after, page_number + 1, search_result.get('pit')
+        )
 
     return result
 
 
+def encode_cursor(
+    sort: str,
+    after: list,
+    page_number: int,
+    pit: Optional[str] = None,
+) -> str:
+    """Курсор: сортировка, значения sort последнего документа, номер страницы
+    и снимок индекса, если листание идёт по снимку"""
+    cursor = {'sort': sort, 'after': after, 'page': page_number}
+    if pit is not None:
+        cursor['pit'] = pit
+    data = orjson.dumps(cursor)
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str, sorts: Tuple[str, ...]) -> dict:
+    """Курсор из параметра page[cursor], sorts - поля сортировки эндпоинта"""
+    try:
+        data = orjson.loads(
+            base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        )
+    except (binascii.Error, ValueError):
+        raise ValueError(INVALID_CURSOR_MESS)
+
+    if (
+        not isinstance(data, dict)
+        or not isinstance(data.get('sort'), str)
+        or data['sort'].lstrip('-') not in sorts
+        or data['sort'].startswith('--')
+        or not isinstance(data.get('after'), list)
+        or not isinstance(data.get('page'), int)
+        or isinstance(data['page'], bool)
+        or data['page'] < 0
+        or not isinstance(data.get('pit', ''), str)
+    ):
+        raise ValueError(INVALID_CURSOR_MESS)
+
+    # у сортировки по id одно значение, у остальных - значение поля и id
+    after = data['after']
+    arity = 1 if data['sort'].lstrip('-') == 'id' else 2
+    if (
+        len(after) != arity
+        or after[-1] is None
+        or any(
+            isinstance(value, bool) or not isinstance(value, CURSOR_VALUE_TYPES)
+            for value in after
+        )
+    ):
+        raise ValueError(INVALID_CURSOR_MESS)
+
+    return data
+
+
 async def pagination(
     page_size: int = Query(ge=1, le=100, default=10, alias='page[size]'),
     page_number: int = Query(default=1, ge=0, alias='page[number]'),
@@ -36,3 +127,121 @@ async def pagination(
     return {'page_size': page_size, 'page_number': page_number}
 
 
+def cursor_pagination_query(sorts: Tuple[str, ...]):
+    """Зависимость для листания по номеру страницы или по курсору,
+    sorts - поля, по которым эндпоинт разрешает сортировать"""
+
+    async def cursor_pagination(
+        page_size: int = Query(ge=1, le=100, default=10, alias='page[size]'),
+        page_number: int = Query(default=1, ge=0, alias='page[number]'),
+        cursor: Optional[str] = Query(
+            None,
+            alias='page[cursor]',
+            description='pagination.next_cursor of the previous page, '
+                        'page[number] and sort are taken from the cursor'
+        ),
+        snapshot: bool = Query(
+            False,
+            alias='page[snapshot]',
+            description='Page through a frozen snapshot of the index, '
+                        'the snapshot is kept in next_cursor'
+        ),
+        ):
+        if cursor is None:
+            return {
+                'page_size': page_size,
+                'page_number': page_number,
+                'cursor': None,
+                'snapshot': snapshot,
+            }
+
+        try:
+            decoded = decode_cursor(cursor, sorts)
+        except ValueError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail=INVALID_CURSOR_MESS
+            )
+        return {
+            'page_size': page_size,
+            'page_number': decoded['page'],
+            'cursor': decoded,
+            'snapshot': snapshot,
+        }
+
+    return cursor_pagination
+
+
+class BatchIds(BaseModel):
+    ids: List[str] = Field(..., min_items=1, max_items=BATCH_MAX_SIZE)
+
+
+def fields_query(
+    model: Type[BaseModel],
+    default: Optional[Tuple[str, ...]],
+):
+    """Зависимость для параметра fields=: поля модели, которые нужно вернуть.
+
+    default None - без fields= возвращаются все поля.
+    """
+    allowed = tuple(model.__fields__)
+
+    async def fields(
+        fields: Optional[str] = Query(
+            None,
+            description=f'Comma separated fields: {", ".join(allowed)}'
+        ),
+    ) -> Optional[Tuple[str, ...]]:
+        if not fields:
+            return default
+
+        requested = {field.strip() for field in fields.split(',')} - {''}
+        unknown = requested - set(allowed)
+        if unknown:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail=f'unknown fields: {", ".join(sorted(unknown))}'
+            )
+        requested.add('id')
+        # порядок полей как в модели, чтобы одинаковые наборы давали один ключ
+        return tuple(field for field in allowed if field in requested)
+
+    return fields
+
+
+def expand_query(allowed: Tuple[str, ...]):
+    """Зависимость для параметра expand=: поля-ссылки, которые нужно раскрыть"""
+
+    async def expand(
+        expand: Optional[str] = Query(
+            None,
+            description=f'Comma separated fields to expand: {", ".join(allowed)}'
+        ),
+    ) -> Tuple[str, ...]:
+        if not expand:
+            return ()
+
+        requested = {field.strip() for field in expand.split(',')} - {''}
+        unknown = requested - set(allowed)
+        if unknown:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail=f'unknown expand fields: {", ".join(sorted(unknown))}'
+            )
+        return tuple(field for field in allowed if field in requested)
+
+    return expand
+
+
+def with_fields(
+    model: Type[BaseModel],
+    fields: Optional[Tuple[str, ...]],
+    extra: Tuple[str, ...],
+) -> Optional[Tuple[str, ...]]:
+    """fields вместе с extra, в порядке полей модели, None - все поля"""
+    if fields is None:
+        return None
+    return tuple(
+        field for field in model.__fields__
+        if field in fields or field in extra
+    )
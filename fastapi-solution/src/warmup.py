@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from src.api.v1.films import (
+    FILM_DEFAULT_FIELDS, FILM_SORT_FIELDS, FILMS_DEFAULT_FIELDS
+)
+from src.api.v1.genres import GENRES_DEFAULT_FIELDS
+from src.api.v1.persons import PERSON_DEFAULT_FIELDS
+from src.services.film import FilmService
+from src.services.genre import GenersService
+from src.services.person import PersonService
+
+logger = logging.getLogger(__name__)
+
+# сортировки, которые принимают эндпоинты списков, в обе стороны
+FILM_SORTS = tuple(
+    f'{direction}{field}'
+    for field in FILM_SORT_FIELDS
+    for direction in ('', '-')
+)
+PERSON_SORTS = ('id', '-id')
+
+
+class CacheWarmUp:
+    """Заполняет кеш первыми страницами списков и популярными id.
+
+    Ключи те же, что у запросов с параметрами по умолчанию.
+    Пока прогрев не закончен, воркер не готов принимать трафик.
+    """
+
+    def __init__(
+        self,
+        film_service: FilmService,
+        person_service: PersonService,
+        genre_service: GenersService,
+        pages: int,
+        page_size: int,
+        concurrency: int,
+        film_ids: List[str],
+        person_ids: List[str],
+    ) -> None:
+        self._film_service = film_service
+        self._person_service = person_service
+        self._genre_service = genre_service
+        self._pages = pages
+        self._page_size = page_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._film_ids = film_ids
+        self._person_ids = person_ids
+        self.ready = False
+        self.warmed = 0
+        self.failed = 0
+        self.duration: Optional[float] = None
+
+    async def run(self) -> None:
+        started = time.monotonic()
+        jobs = [
+            *(
+                lambda sort=sort, page=page: self._film_service.get_films(
+                    self._page_size, page, sort, FILMS_DEFAULT_FIELDS
+                )
+                for sort in FILM_SORTS
+                for page in range(self._pages)
+            ),
+            *(
+                lambda sort=sort, page=page: self._person_service.get_persons(
+                    self._page_size, page, sort, PERSON_DEFAULT_FIELDS
+                )
+                for sort in PERSON_SORTS
+                for page in range(self._pages)
+            ),
+            *(
+                lambda page=page: self._genre_service.get_genres(
+                    self._page_size, page, fields=GENRES_DEFAULT_FIELDS
+                )
+                for page in range(self._pages)
+            ),
+            # панель фильтров без выбранных фильтров
+            self._film_service.get_facets,
+        ]
+        if self._film_ids:
+            jobs.append(lambda: self._film_service.get_by_ids(
+                self._film_ids, FILM_DEFAULT_FIELDS
+            ))
+        if self._person_ids:
+            jobs.append(lambda: self._person_service.get_by_ids(
+                self._person_ids, PERSON_DEFAULT_FIELDS
+            ))
+
+        await asyncio.gather(*map(self._warm, jobs))
+        self.duration = time.monotonic() - started
+        self.ready = True
+        logger.info(
+            'cache warm-up finished in %.2fs: %s warmed, %s failed',
+            self.duration,
+            self.warmed,
+            self.failed
+        )
+
+    def stats(self) -> dict:
+        return {
+            'ready': self.ready,
+            'warmed': self.warmed,
+            'failed': self.failed,
+            'duration': self.duration,
+        }
+
+    async def _warm(self, job: Callable[[], Awaitable]) -> None:
+        async with self._semaphore:
+            try:
+                await job()
+            except Exception:
+                # недогретый ключ заполнится первым запросом
+                logger.exception('cache warm-up request failed')
+                self.failed += 1
+            else:
+                self.warmed += 1
+
+
+cache_warmup: Optional[CacheWarmUp] = None
+
+
+def is_ready() -> bool:
+    return cache_warmup is None or cache_warmup.ready
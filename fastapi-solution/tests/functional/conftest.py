@@ -3,6 +3,9 @@ import aiohttp
 
 import asyncio
 import json
+import time
+import jwt
+import redis
 from elasticsearch import AsyncElasticsearch
 
 from tests.functional.settings import test_settings
@@ -23,10 +26,34 @@ def pytest_sessionfinish(session, exitstatus):
     asyncio.get_event_loop().close()
 
 
+@pytest.fixture(scope='session')
+def make_access_token():
+    with open(test_settings.jwt_private_key_path) as key_file:
+        private_key = key_file.read()
+
+    def inner(expires_in=300, key=private_key, **claims):
+        payload = {
+            'sub': 'test-user',
+            'type': 'access',
+            'exp': int(time.time()) + expires_in,
+            **claims,
+        }
+        return jwt.encode(
+            payload,
+            key,
+            algorithm='RS256',
+            headers={'kid': test_settings.jwt_key_id}
+        )
+    return inner
+
+
 @pytest.fixture
-async def make_get_request():
-    async def inner(url, params=None): 
-        async with aiohttp.ClientSession() as session: 
+async def make_get_request(make_access_token):
+    async def inner(url, params=None, access_token=None):
+        if access_token is None:
+            access_token = make_access_token()
+        cookies = {'access_token_cookie': access_token}
+        async with aiohttp.ClientSession(cookies=cookies) as session: 
             async with session.get(url, params=params) as response:
                 body = await response.json()       
                 status = response.status
@@ -35,6 +62,38 @@ async def make_get_request():
     return inner
 
 
+@pytest.fixture
+async def make_raw_get_request(make_access_token):
+    """GET с заголовками запроса, возвращает статус, заголовки и тело"""
+    async def inner(url, params=None, headers=None, access_token=None):
+        if access_token is None:
+            access_token = make_access_token()
+        cookies = {'access_token_cookie': access_token}
+        async with aiohttp.ClientSession(cookies=cookies) as session:
+            async with session.get(
+                url, params=params, headers=headers
+            ) as response:
+                body = await response.read()
+                return response.status, response.headers, body
+
+    return inner
+
+
+@pytest.fixture
+async def make_post_request(make_access_token):
+    async def inner(url, json_body=None, access_token=None):
+        if access_token is None:
+            access_token = make_access_token()
+        cookies = {'access_token_cookie': access_token}
+        async with aiohttp.ClientSession(cookies=cookies) as session:
+            async with session.post(url, json=json_body) as response:
+                body = await response.json()
+                status = response.status
+                return status, body
+
+    return inner
+
+
 @pytest.fixture(scope='session')
 async def es_client():
     es_client = AsyncElasticsearch(hosts=test_settings.es_host)
@@ -42,6 +101,17 @@ async def es_client():
     await es_client.close()
 
 
+@pytest.fixture(scope='session')
+def redis_client():
+    client = redis.StrictRedis(
+        host=test_settings.redis_host,
+        port=test_settings.redis_port,
+        password=test_settings.redis_password,
+    )
+    yield client
+    client.close()
+
+
 def get_es_bulk_query(es_data, index, id_field):
     bulk_query = []
     for row in es_data:
@@ -7,6 +7,17 @@ class TestSettings(BaseSettings):
     es_host: str = os.environ['ELASTIC_URL']
     es_id_field: str = 'id'
     service_url: str = os.environ.get('SERVICE_URL', 'http://127.0.0.1:80')
+    # сервис с кешем ответов и снимком жанров, см. docker-compose.yml
+    service_cached_url: str = os.environ.get(
+        'SERVICE_CACHED_URL', 'http://127.0.0.1:80'
+    )
+    redis_host: str = os.environ['REDIS_HOST']
+    redis_port: int = int(os.environ['REDIS_PORT'])
+    redis_password: str = os.environ['REDIS_PASSWORD']
+    jwt_private_key_path: str = os.path.join(
+        os.path.dirname(__file__), 'testdata', 'private_key.pem'
+    )
+    jwt_key_id: str = 'test-key'
  
 
 test_settings = TestSettings()
@@ -0,0 +1,52 @@
+from http import HTTPStatus
+from typing import Callable
+
+import pytest
+
+from tests.functional.settings import test_settings
+
+
+@pytest.mark.parametrize(
+    'token_data, expected_answer',
+    [
+        (
+            {'expires_in': 300},
+            {'status': HTTPStatus.NOT_FOUND, 'body': {'detail': 'film not found'}}
+        ),
+        (
+            {'expires_in': -300},
+            {'status': HTTPStatus.UNAUTHORIZED, 'body': {'detail': 'Token expired'}}
+        ),
+        (
+            {'expires_in': 300, 'type': 'refresh'},
+            {'status': HTTPStatus.UNAUTHORIZED, 'body': {'detail': 'Token expired'}}
+        ),
+    ]
+)
+@pytest.mark.asyncio
+async def test_local_token_verification(
+    token_data: dict,
+    expected_answer: dict,
+    make_get_request: Callable,
+    make_access_token: Callable,
+) -> None:
+    url = test_settings.service_url + '/api/v1/films/unknown'
+    access_token = make_access_token(**token_data)
+    status, body = await make_get_request(url, access_token=access_token)
+
+    assert expected_answer['status'] == status
+    assert body == expected_answer['body']
+
+
+@pytest.mark.asyncio
+async def test_token_with_wrong_signature(
+    make_get_request: Callable,
+    make_access_token: Callable,
+) -> None:
+    url = test_settings.service_url + '/api/v1/films/unknown'
+    access_token = make_access_token()
+    header, payload, signature = access_token.split('.')
+    forged_token = '.'.join([header, payload, signature[::-1]])
+    status, body = await make_get_request(url, access_token=forged_token)
+
+    assert status == HTTPStatus.UNAUTHORIZED
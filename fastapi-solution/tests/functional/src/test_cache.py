@@ -0,0 +1,61 @@
+import asyncio
+import json
+import uuid
+from http import HTTPStatus
+from typing import Callable
+
+import pytest
+from redis import StrictRedis
+
+from tests.functional.settings import test_settings
+from tests.functional.utils.helpers import make_film, wait_until
+
+
+@pytest.mark.asyncio
+async def test_changes_message_drops_tagged_keys(
+    es_write_data: Callable,
+    make_get_request: Callable,
+    redis_client: StrictRedis,
+    delete_index: Callable,
+) -> None:
+    film_id = str(uuid.uuid4())
+    await es_write_data([make_film(film_id)])
+    url = test_settings.service_url + f'/api/v1/films/{film_id}'
+    status, _ = await make_get_request(url)
+    assert status == HTTPStatus.OK
+
+    [tag] = redis_client.keys(f'movies:*:tag:id:{film_id}')
+    keys = redis_client.smembers(tag)
+    assert keys and redis_client.exists(*keys) == len(keys)
+
+    # сообщение ETL об изменении фильма
+    redis_client.publish(
+        'cache:changes',
+        json.dumps({'index': 'movies', 'ids': [film_id]})
+    )
+
+    assert await wait_until(lambda: not redis_client.exists(tag, *keys))
+
+    await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_redis_pool_stats(make_get_request: Callable) -> None:
+    # пачка параллельных промахов кеша: пайплайны захватывают соединения
+    await asyncio.gather(*(
+        make_get_request(
+            test_settings.service_url + f'/api/v1/films/{uuid.uuid4()}'
+        )
+        for _ in range(50)
+    ))
+    status, body = await make_get_request(
+        test_settings.service_url + '/internal/stats'
+    )
+
+    assert status == HTTPStatus.OK
+    pool = body['redis_pool']
+    # пул не вырос сверх maxsize и не опустел ниже minsize
+    assert pool['minsize'] <= pool['size'] <= pool['maxsize']
+    # после ответа все соединения вернулись в пул
+    assert pool['in_use'] == 0
+    assert pool['wait_max_ms'] >= pool['wait_avg_ms'] >= 0
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import uuid
+from http import HTTPStatus
+from typing import Callable
+
+import pytest
+from redis import StrictRedis
+
+from tests.functional.settings import test_settings
+from tests.functional.utils.helpers import make_film
+
+
+@pytest.mark.asyncio
+async def test_etag_is_stable_across_hits(
+    es_write_data: Callable,
+    make_raw_get_request: Callable,
+    delete_index: Callable,
+) -> None:
+    film_id = str(uuid.uuid4())
+    await es_write_data([make_film(film_id)])
+    url = test_settings.service_url + f'/api/v1/films/{film_id}'
+
+    responses = [await make_raw_get_request(url) for _ in range(5)]
+
+    assert {status for status, _, _ in responses} == {HTTPStatus.OK}
+    etags = {headers['ETag'] for _, headers, _ in responses}
+    assert len(etags) == 1
+    [etag] = etags
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert responses[0][1]['Cache-Control'].startswith('private')
+
+    await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_if_none_match_returns_not_modified(
+    es_write_data: Callable,
+    make_raw_get_request: Callable,
+    delete_index: Callable,
+) -> None:
+    film_id = str(uuid.uuid4())
+    await es_write_data([make_film(film_id)])
+    url = test_settings.service_url + f'/api/v1/films/{film_id}'
+    _, headers, _ = await make_raw_get_request(url)
+    etag = headers['ETag']
+
+    status, headers, body = await make_raw_get_request(
+        url, headers={'If-None-Match': etag}
+    )
+    assert status == HTTPStatus.NOT_MODIFIED
+    assert headers['ETag'] == etag
+    assert body == b''
+
+    # слабое сравнение: ETag подходит и без W/, и в списке
+    status, _, _ = await make_raw_get_request(
+        url, headers={'If-None-Match': f'"other", {etag[2:]}'}
+    )
+    assert status == HTTPStatus.NOT_MODIFIED
+
+    status, headers, body = await make_raw_get_request(
+        url, headers={'If-None-Match': '"other"'}
+    )
+    assert status == HTTPStatus.OK
+    assert json.loads(body)['id'] == film_id
+
+    await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_etag_changes_with_film(
+    es_write_data: Callable,
+    make_raw_get_request: Callable,
+    redis_client: StrictRedis,
+    delete_index: Callable,
+) -> None:
+    film_id = str(uuid.uuid4())
+    await es_write_data([make_film(film_id)])
+    url = test_settings.service_url + f'/api/v1/films/{film_id}'
+    _, headers, _ = await make_raw_get_request(url)
+    etag = headers['ETag']
+
+    await es_write_data([make_film(film_id, title='The Renamed')])
+    redis_client.publish(
+        'cache:changes',
+        json.dumps({'index': 'movies', 'ids': [film_id]})
+    )
+
+    # сообщение обрабатывают все воркеры, ответ может прийти от любого
+    for _ in range(50):
+        _, headers, _ = await make_raw_get_request(url)
+        if headers['ETag'] != etag:
+            break
+        await asyncio.sleep(0.1)
+    assert headers['ETag'] != etag
+
+    status, _, _ = await make_raw_get_request(
+        url, headers={'If-None-Match': etag}
+    )
+    assert status == HTTPStatus.OK
+
+    await delete_index()
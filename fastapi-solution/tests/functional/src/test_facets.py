@@ -0,0 +1,122 @@
+import json
+from http import HTTPStatus
+from typing import Callable
+
+import pytest
+from redis import StrictRedis
+
+from tests.functional.settings import test_settings
+from tests.functional.utils.helpers import make_film, wait_until
+
+FACETS_URL = test_settings.service_url + '/api/v1/films/facets/'
+
+FILMS = [
+    make_film(1, genre=['Action', 'Sci-Fi'], imdb_rating=8.5, age_limit=12),
+    make_film(2, genre=['Action'], imdb_rating=7.2, age_limit=16),
+    make_film(3, genre=['Drama'], imdb_rating=6.1, age_limit=12),
+    make_film(4, genre=['Action', 'Drama'], imdb_rating=9.0, age_limit=18),
+    make_film(5, genre=['Comedy'], imdb_rating=5.5, age_limit=16),
+]
+
+
+def rating_buckets(counts: dict) -> list:
+    return [
+        {'from': band, 'to': band + 1, 'count': counts.get(band, 0)}
+        for band in range(10)
+    ]
+
+
+@pytest.mark.parametrize(
+    'params, expected',
+    [
+        (
+            {},
+            {
+                'total': 5,
+                'genre': [
+                    {'value': 'Action', 'count': 3},
+                    {'value': 'Drama', 'count': 2},
+                    {'value': 'Comedy', 'count': 1},
+                    {'value': 'Sci-Fi', 'count': 1},
+                ],
+                'imdb_rating': rating_buckets({5: 1, 6: 1, 7: 1, 8: 1, 9: 1}),
+                'age_limit': [
+                    {'value': 12, 'count': 2},
+                    {'value': 16, 'count': 2},
+                    {'value': 18, 'count': 1},
+                ],
+            }
+        ),
+        (
+            {'genre': 'Action'},
+            {
+                'total': 3,
+                'genre': [
+                    {'value': 'Action', 'count': 3},
+                    {'value': 'Drama', 'count': 1},
+                    {'value': 'Sci-Fi', 'count': 1},
+                ],
+                'imdb_rating': rating_buckets({7: 1, 8: 1, 9: 1}),
+                'age_limit': [
+                    {'value': 12, 'count': 1},
+                    {'value': 16, 'count': 1},
+                    {'value': 18, 'count': 1},
+                ],
+            }
+        ),
+        (
+            {'genre': 'Drama, Action', 'min_rating': 8},
+            {
+                'total': 1,
+                'genre': [
+                    {'value': 'Action', 'count': 1},
+                    {'value': 'Drama', 'count': 1},
+                ],
+                'imdb_rating': rating_buckets({9: 1}),
+                'age_limit': [{'value': 18, 'count': 1}],
+            }
+        ),
+        (
+            {'min_rating': 7},
+            {
+                'total': 3,
+                'genre': [
+                    {'value': 'Action', 'count': 3},
+                    {'value': 'Drama', 'count': 1},
+                    {'value': 'Sci-Fi', 'count': 1},
+                ],
+                'imdb_rating': rating_buckets({7: 1, 8: 1, 9: 1}),
+                'age_limit': [
+                    {'value': 12, 'count': 1},
+                    {'value': 16, 'count': 1},
+                    {'value': 18, 'count': 1},
+                ],
+            }
+        ),
+    ]
+)
+@pytest.mark.asyncio
+async def test_facet_counts(
+    params: dict,
+    expected: dict,
+    es_write_data: Callable,
+    make_get_request: Callable,
+    redis_client: StrictRedis,
+    delete_index: Callable,
+) -> None:
+    await es_write_data(FILMS)
+    # фасеты в кеше помечены тегом поиска, сбрасываем их вместе со списками
+    redis_client.publish(
+        'cache:changes',
+        json.dumps({'index': 'movies', 'ids': [], 'lists': True})
+    )
+    assert await wait_until(
+        lambda: not redis_client.keys('movies:*:tag:search')
+    )
+
+    status, body = await make_get_request(FACETS_URL, params)
+
+    assert status == HTTPStatus.OK
+    assert body == expected
+
+    await delete_index()
@@ -119,3 +119,131 @@ async def test_get_all_films(
     assert status == HTTPStatus.OK
 
     await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_films_batch(
+    es_write_data: Callable,
+    make_post_request: Callable,
+    delete_index: Callable,
+) -> None:
+    es_data = [{
+        'id': str(i),
+        'imdb_rating': i,
+        'genre': ['Action'],
+        'title': f'The Star {i}',
+        'description': 'New World',
+        'director': ['Stan'],
+        'actors': [],
+        'writers': [],
+    } for i in range(3)]
+
+    await es_write_data(es_data)
+
+    url = test_settings.service_url + '/api/v1/films/batch'
+    status, body = await make_post_request(
+        url,
+        {'ids': ['2', 'unknown', '0']}
+    )
+
+    assert status == HTTPStatus.OK
+    assert [film and film['id'] for film in body['result']] == ['2', None, '0']
+    assert body['not_found'] == ['unknown']
+
+    await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_expand_does_not_change_plain_responses(
+    es_write_data: Callable,
+    es_client,
+    make_get_request: Callable,
+    make_post_request: Callable,
+    delete_index: Callable,
+) -> None:
+    await es_write_data([{
+        'id': 'expanded-1',
+        'imdb_rating': 7.0,
+        'genre': ['Action'],
+        'title': 'The Expanded',
+        'director': ['Stan'],
+        'actors': [{'id': 'expanded-person-1', 'name': 'Ann'}],
+        'writers': [],
+    }])
+    await es_client.index(
+        index='person',
+        id='expanded-person-1',
+        body={
+            'id': 'expanded-person-1',
+            'name': 'Ann',
+            'role': 'actor',
+            'film_ids': 'expanded-1',
+        },
+        refresh=True
+    )
+
+    # запросы расходятся по воркерам, у каждого свой локальный кеш
+    url = test_settings.service_url + '/api/v1/films/expanded-1'
+    for _ in range(8):
+        status, body = await make_get_request(url, {'expand': 'actors'})
+        assert status == HTTPStatus.OK
+        assert body['actors'][0]['role'] == 'actor'
+
+    batch_url = (
+        test_settings.service_url
+        + '/api/v1/films/batch?fields=title,imdb_rating,actors'
+    )
+    for _ in range(8):
+        status, body = await make_post_request(batch_url, {'ids': ['expanded-1']})
+        assert status == HTTPStatus.OK
+        assert body['result'][0]['actors'] == [
+            {'id': 'expanded-person-1', 'name': 'Ann'}
+        ]
+
+    await es_client.indices.delete(index='person')
+    await delete_index()
+
+
+# размер страницы свой, чтобы не получить страницу из кеша другого теста
+@pytest.mark.parametrize(
+    'path, params',
+    [
+        ('/api/v1/films/', {'page[size]': 7, 'page[number]': 0}),
+        (
+            '/api/v1/films/search/',
+            {'search_word': 'star', 'page[size]': 7, 'page[number]': 0}
+        ),
+    ]
+)
+@pytest.mark.asyncio
+async def test_film_lists_return_full_films(
+    path: str,
+    params: dict,
+    es_write_data: Callable,
+    make_get_request: Callable,
+    delete_index: Callable,
+) -> None:
+    film = {
+        'id': 1,
+        'imdb_rating': 8.5,
+        'genre': ['Action', 'Sci-Fi'],
+        'title': 'The Star',
+        'description': 'New World',
+        'director': ['Stan'],
+        'actors': [{'id': '111', 'name': 'Ann'}],
+        'writers': [{'id': '333', 'name': 'Ben'}],
+    }
+    await es_write_data([film])
+    url = test_settings.service_url + path
+
+    status, body = await make_get_request(url, params)
+    assert status == HTTPStatus.OK
+    [result] = body['result']
+    # без fields= список отдаёт фильмы целиком, как и раньше
+    assert {key: result[key] for key in film} == {**film, 'id': '1'}
+
+    status, body = await make_get_request(url, {**params, 'fields': 'title'})
+    assert status == HTTPStatus.OK
+    assert body['result'] == [{'id': '1', 'title': 'The Star'}]
+
+    await delete_index()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import uuid
+from http import HTTPStatus
+from typing import Callable, List
+
+import pytest
+from redis import StrictRedis
+
+from tests.functional.settings import test_settings
+
+GENRES_URL = test_settings.service_cached_url + '/api/v1/genres/'
+
+
+@pytest.fixture()
+def f_index_name() -> str:
+    return 'genres'
+
+
+def make_genres(word: str, count: int) -> List[dict]:
+    return [{
+        'id': f'{word}-{i:02}',
+        'title': f'{word} {"Noir" if i % 2 else "Drama"}',
+        'imdb_rating': float(i),
+    } for i in range(count)]
+
+
+def publish_changes(redis_client: StrictRedis, ids: List[str]) -> None:
+    # lists - ещё и ответы со списками жанров из кеша ответов
+    redis_client.publish(
+        'cache:changes',
+        json.dumps({'index': 'genres', 'ids': ids, 'lists': True})
+    )
+
+
+async def wait_for_search(
+    make_raw_get_request: Callable,
+    word: str,
+    count: int,
+) -> None:
+    """Воркеры перечитали снимок: поиск везде видит count жанров"""
+    params = {'search_word': word, 'page[size]': 50, 'page[number]': 0}
+    # ответ воркера со старым снимком не должен попасть в кеш ответов
+    headers = {'Cache-Control': 'no-store'}
+    for _ in range(50):
+        results = [
+            await make_raw_get_request(GENRES_URL + 'search/', params, headers)
+            for _ in range(8)
+        ]
+        if all(
+            len(json.loads(body)['result']) == count
+            for _, _, body in results
+        ):
+            return
+        await asyncio.sleep(0.1)
+    raise AssertionError(f'catalog snapshot without {count} "{word}" genres')
+
+
+@pytest.mark.asyncio
+async def test_catalog_serves_without_elastic(
+    es_write_data: Callable,
+    make_get_request: Callable,
+    make_raw_get_request: Callable,
+    redis_client: StrictRedis,
+    delete_index: Callable,
+) -> None:
+    word = uuid.uuid4().hex
+    genres = make_genres(word, 12)
+    await delete_index()
+    await es_write_data(genres)
+    publish_changes(redis_client, [genre['id'] for genre in genres])
+    await wait_for_search(make_raw_get_request, word, 12)
+
+    # дальше отвечает только снимок в памяти
+    await delete_index()
+
+    status, body = await make_get_request(
+        GENRES_URL + 'search/',
+        {'search_word': f'{word} noir', 'page[size]': 3, 'page[number]': 0}
+    )
+    assert status == HTTPStatus.OK
+    # сначала жанры, где совпали оба слова
+    assert [genre['id'] for genre in body['result']] == [
+        f'{word}-01', f'{word}-03', f'{word}-05'
+    ]
+    assert body['pagination']['next'] == 1
+
+    status, body = await make_get_request(GENRES_URL + f'{word}-04')
+    assert status == HTTPStatus.OK
+    assert body == {'id': f'{word}-04', 'title': f'{word} Drama'}
+
+    seen = []
+    params = {'page[size]': 5, 'page[number]': 0}
+    while True:
+        status, body = await make_get_request(GENRES_URL, params)
+        assert status == HTTPStatus.OK
+        seen.extend(genre['id'] for genre in body['result'])
+        if 'next_cursor' not in body['pagination']:
+            break
+        params = {
+            'page[size]': 5,
+            'page[cursor]': body['pagination']['next_cursor']
+        }
+
+    assert seen == sorted((genre['id'] for genre in genres), reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_catalog_refresh_on_changes(
+    es_write_data: Callable,
+    make_get_request: Callable,
+    make_raw_get_request: Callable,
+    redis_client: StrictRedis,
+    delete_index: Callable,
+) -> None:
+    word = uuid.uuid4().hex
+    genres = make_genres(word, 3)
+    await delete_index()
+    await es_write_data(genres)
+    publish_changes(redis_client, [genre['id'] for genre in genres])
+    await wait_for_search(make_raw_get_request, word, 3)
+
+    added = {'id': f'{word}-99', 'title': f'{word} Western', 'imdb_rating': 1.0}
+    await es_write_data([added])
+    publish_changes(redis_client, [added['id']])
+    await wait_for_search(make_raw_get_request, word, 4)
+
+    status, body = await make_get_request(
+        GENRES_URL + 'search/',
+        {'search_word': 'western', 'page[size]': 10, 'page[number]': 0}
+    )
+    assert status == HTTPStatus.OK
+    assert [genre['id'] for genre in body['result']] == [added['id']]
+
+    await delete_index()
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import uuid
+from http import HTTPStatus
+from typing import Callable
+
+import pytest
+from redis import StrictRedis
+
+from tests.functional.settings import test_settings
+from tests.functional.utils.helpers import make_film
+
+FILMS_URL = test_settings.service_cached_url + '/api/v1/films/'
+
+
+@pytest.mark.asyncio
+async def test_second_request_is_served_from_cache(
+    es_write_data: Callable,
+    make_raw_get_request: Callable,
+    delete_index: Callable,
+) -> None:
+    film_id = str(uuid.uuid4())
+    await es_write_data([make_film(film_id)])
+    url = FILMS_URL + film_id
+
+    status, headers, body = await make_raw_get_request(url)
+    assert status == HTTPStatus.OK
+    assert 'x-cache' not in headers
+
+    status, cached_headers, cached_body = await make_raw_get_request(url)
+    assert status == HTTPStatus.OK
+    assert cached_headers['x-cache'] == 'hit'
+    assert cached_body == body
+    assert cached_headers['ETag'] == headers['ETag']
+    assert json.loads(cached_body)['id'] == film_id
+
+    status, cached_headers, cached_body = await make_raw_get_request(
+        url, headers={'If-None-Match': headers['ETag']}
+    )
+    assert status == HTTPStatus.NOT_MODIFIED
+    assert cached_headers['x-cache'] == 'hit'
+    assert cached_body == b''
+
+    await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_query_order_does_not_change_key(
+    es_write_data: Callable,
+    make_raw_get_request: Callable,
+    redis_client: StrictRedis,
+    delete_index: Callable,
+) -> None:
+    word = uuid.uuid4().hex
+    await es_write_data([make_film(str(uuid.uuid4()), title=word)])
+    url = FILMS_URL + 'search/'
+    params = [('search_word', word), ('page[size]', '5'), ('page[number]', '0')]
+    keys = set(redis_client.keys('response:*'))
+
+    status, headers, _ = await make_raw_get_request(url, params)
+    assert status == HTTPStatus.OK
+    assert 'x-cache' not in headers
+    assert len(set(redis_client.keys('response:*')) - keys) == 1
+
+    _, headers, _ = await make_raw_get_request(url, params[::-1])
+    assert headers['x-cache'] == 'hit'
+
+    _, headers, _ = await make_raw_get_request(
+        url, [*params[:-1], ('page[number]', '1')]
+    )
+    assert 'x-cache' not in headers
+
+    await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_cached_response_requires_token(
+    es_write_data: Callable,
+    make_raw_get_request: Callable,
+    make_access_token: Callable,
+    delete_index: Callable,
+) -> None:
+    film_id = str(uuid.uuid4())
+    await es_write_data([make_film(film_id)])
+    url = FILMS_URL + film_id
+    await make_raw_get_request(url)
+    _, headers, _ = await make_raw_get_request(url)
+    assert headers['x-cache'] == 'hit'
+
+    for access_token in (make_access_token(expires_in=-300), 'not-a-token'):
+        status, headers, body = await make_raw_get_request(
+            url, access_token=access_token
+        )
+        assert status == HTTPStatus.UNAUTHORIZED
+        assert 'x-cache' not in headers
+        assert film_id not in body.decode()
+
+    await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_no_cache_request_skips_stored_response(
+    es_write_data: Callable,
+    make_raw_get_request: Callable,
+    delete_index: Callable,
+) -> None:
+    film_id = str(uuid.uuid4())
+    await es_write_data([make_film(film_id)])
+    url = FILMS_URL + film_id
+    await make_raw_get_request(url)
+
+    status, headers, _ = await make_raw_get_request(
+        url, headers={'Cache-Control': 'no-cache'}
+    )
+    assert status == HTTPStatus.OK
+    assert 'x-cache' not in headers
+
+    await delete_index()
+
+
+@pytest.mark.asyncio
+async def test_changes_message_drops_cached_response(
+    es_write_data: Callable,
+    make_raw_get_request: Callable,
+    redis_client: StrictRedis,
+    delete_index: Callable,
+) -> None:
+    film_id = str(uuid.uuid4())
+    await es_write_data([make_film(film_id)])
+    url = FILMS_URL + film_id
+    await make_raw_get_request(url)
+    _, headers, _ = await make_raw_get_request(url)
+    assert headers['x-cache'] == 'hit'
+
+    await es_write_data([make_film(film_id, title='The Renamed')])
+    redis_client.publish(
+        'cache:changes',
+        json.dumps({'index': 'movies', 'ids': [film_id]})
+    )
+
+    for _ in range(50):
+        status, headers, body = await make_raw_get_request(url)
+        if json.loads(body)['title'] == 'The Renamed':
+            break
+        await asyncio.sleep(0.1)
+    assert status == HTTPStatus.OK
+    assert json.loads(body)['title'] == 'The Renamed'
+
+    _, headers, _ = await make_raw_get_request(url)
+    assert headers['x-cache'] == 'hit'
+
+    await delete_index()
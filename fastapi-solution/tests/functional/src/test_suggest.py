@@ -0,0 +1,88 @@
+from http import HTTPStatus
+from typing import Callable
+
+import pytest
+
+from tests.functional.settings import test_settings
+from tests.functional.utils.helpers import make_film
+
+SUGGEST_URL = test_settings.service_url + '/api/v1/films/suggest/'
+
+# числовые id: в индексе без схемы по строковому id не отсортировать
+FILMS = [
+    make_film(1, title='Star Wars', imdb_rating=8.6),
+    make_film(2, title='Star Trek', imdb_rating=7.9),
+    make_film(3, title='Stardust', imdb_rating=7.6),
+    make_film(4, title='Lost Stars', imdb_rating=7.0),
+    make_film(5, title='Moon', imdb_rating=8.0),
+]
+
+
+@pytest.mark.parametrize(
+    'prefix, expected_ids',
+    [
+        ('st', ['1', '2', '3', '4']),
+        ('star', ['1', '2', '3', '4']),
+        ('stars', ['4']),
+        ('star w', ['1']),
+        ('  STAR   t', ['2']),
+        ('lost st', ['4']),
+        ('star moon', []),
+    ]
+)
+@pytest.mark.asyncio
+async def test_suggest_by_prefix(
+    prefix: str,
+    expected_ids: list,
+    es_write_data: Callable,
+    make_get_request: Callable,
+    delete_index: Callable,
+) -> None:
+    await es_write_data(FILMS)
+    # короткий префикс кешируется целиком, длинные отбираются из него
+    status, _ = await make_get_request(SUGGEST_URL, {'prefix': 'st'})
+    assert status == HTTPStatus.OK
+
+    status, body = await make_get_request(SUGGEST_URL, {'prefix': prefix})
+
+    assert status == HTTPStatus.OK
+    assert [film['id'] for film in body] == expected_ids
+    titles = {str(film['id']): film['title'] for film in FILMS}
+    assert body == [{'id': id_, 'title': titles[id_]} for id_ in expected_ids]
+
+    await delete_index()
+
+
+@pytest.mark.parametrize(
+    'params, expected_status, expected_ids',
+    [
+        ({'prefix': 'st', 'limit': 2}, HTTPStatus.OK, ['1', '2']),
+        ({'prefix': 'st', 'limit': 20}, HTTPStatus.OK, ['1', '2', '3', '4']),
+        ({'prefix': 'st', 'limit': 0}, HTTPStatus.UNPROCESSABLE_ENTITY, None),
+        ({'prefix': 'st', 'limit': 21}, HTTPStatus.UNPROCESSABLE_ENTITY, None),
+        ({'prefix': 's' * 101}, HTTPStatus.UNPROCESSABLE_ENTITY, None),
+        ({}, HTTPStatus.UNPROCESSABLE_ENTITY, None),
+        ({'prefix': ''}, HTTPStatus.OK, []),
+        ({'prefix': 's'}, HTTPStatus.OK, []),
+        ({'prefix': '   '}, HTTPStatus.OK, []),
+        ({'prefix': '!?'}, HTTPStatus.OK, []),
+    ]
+)
+@pytest.mark.asyncio
+async def test_suggest_limits_and_empty_prefix(
+    params: dict,
+    expected_status: HTTPStatus,
+    expected_ids: list,
+    es_write_data: Callable,
+    make_get_request: Callable,
+    delete_index: Callable,
+) -> None:
+    await es_write_data(FILMS)
+
+    status, body = await make_get_request(SUGGEST_URL, params)
+
+    assert status == expected_status
+    if expected_ids is not None:
+        assert [film['id'] for film in body] == expected_ids
+
+    await delete_index()
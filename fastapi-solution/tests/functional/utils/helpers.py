@@ -0,0 +1,24 @@
+import asyncio
+from typing import Callable
+
+
+async def wait_until(condition: Callable[[], bool], timeout: float = 5) -> bool:
+    for _ in range(int(timeout / 0.1)):
+        if condition():
+            return True
+        await asyncio.sleep(0.1)
+    return condition()
+
+
+def make_film(film_id: str, **values) -> dict:
+    return {
+        'id': film_id,
+        'imdb_rating': 7.5,
+        'genre': ['Drama'],
+        'title': 'The Cached',
+        'description': 'Cache test',
+        'director': ['Stan'],
+        'actors': [{'id': '111', 'name': 'Ann'}],
+        'writers': [{'id': '333', 'name': 'Ben'}],
+        **values,
+    }
@@ -0,0 +1,167 @@
+import asyncio
+import copy
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import pytest
+from elasticsearch import NotFoundError
+
+from src.db.async_cache_storage import AsyncCacheStorage
+from src.db.async_search_engine import AsyncSearchEngine
+
+
+class DictCacheStorage(AsyncCacheStorage):
+    """Хранилище в dict со сроками жизни ключей и тегами"""
+
+    def __init__(self) -> None:
+        self.data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self.tags: Dict[str, set] = {}
+        self.gets = 0
+        self.sets = 0
+
+    async def get(self, key: str, **kwargs) -> Optional[bytes]:
+        self.gets += 1
+        value, expire_at = self.data.get(key, (None, None))
+        if expire_at is not None and expire_at <= time.time():
+            return None
+        return value
+
+    async def get_with_ttl(
+        self,
+        key: str,
+        **kwargs
+    ) -> Tuple[Optional[bytes], Optional[float]]:
+        value = await self.get(key)
+        if value is None:
+            return None, None
+        return value, self.data[key][1] - time.time()
+
+    async def set(
+        self,
+        key: str,
+        value: Union[str, bytes],
+        expire: int,
+        **kwargs
+    ) -> None:
+        self.sets += 1
+        if isinstance(value, str):
+            value = value.encode()
+        self.data[key] = (value, time.time() + expire)
+
+    async def set_tagged(
+        self,
+        items: Dict[str, Union[str, bytes]],
+        tags: Dict[str, List[str]],
+        expire: int,
+        tag_expire: Optional[int] = None,
+        **kwargs
+    ) -> None:
+        for key, value in items.items():
+            await self.set(key, value, expire)
+        for tag, keys in tags.items():
+            self.tags.setdefault(tag, set()).update(keys)
+
+    async def pop_tagged(self, tags: List[str], **kwargs) -> List[str]:
+        keys = sorted(set().union(*(self.tags.pop(tag, set()) for tag in tags)))
+        for key in keys:
+            self.data.pop(key, None)
+        return keys
+
+    async def publish(self, channel: str, message: Union[str, bytes]) -> int:
+        return 0
+
+    async def listen(self, channel: str) -> AsyncIterator[bytes]:
+        await asyncio.Event().wait()
+        yield b''
+
+    def close(self, **kwargs) -> None:
+        pass
+
+    async def wait_closed(self, **kwargs) -> None:
+        pass
+
+
+class StubSearchEngine(AsyncSearchEngine):
+    """Документы по индексам в памяти, считает обращения"""
+
+    def __init__(self, docs: Dict[str, List[dict]], delay: float = 0.01) -> None:
+        self.docs = docs
+        self.delay = delay
+        self.searches = 0
+        self.gets = 0
+        self.mgets = 0
+
+    async def search(self, index: str, body: dict, **kwargs) -> dict:
+        self.searches += 1
+        await asyncio.sleep(self.delay)
+        hits = [
+            {'_id': str(doc['id']), '_source': doc}
+            for doc in self.docs.get(index, [])
+        ]
+        start = body.get('from', 0)
+        return {
+            'hits': {
+                'total': {'value': len(hits), 'relation': 'eq'},
+                'hits': hits[start:start + body.get('size', 10)],
+            }
+        }
+
+    async def search_many(self, searches, **kwargs) -> list:
+        return [await self.search(index, body) for index, body in searches]
+
+    async def get(self, index: str, entity_id: str, **kwargs) -> dict:
+        self.gets += 1
+        await asyncio.sleep(self.delay)
+        for doc in self.docs.get(index, []):
+            if str(doc['id']) == entity_id:
+                return {'_id': entity_id, '_source': doc, 'found': True}
+        raise NotFoundError(404, 'not_found', {})
+
+    async def get_many(self, index: str, entity_ids: List[str], **kwargs) -> list:
+        self.mgets += 1
+        await asyncio.sleep(self.delay)
+        by_id = {str(doc['id']): doc for doc in self.docs.get(index, [])}
+        return [
+            {'_id': entity_id, 'found': True, '_source': by_id[entity_id]}
+            if entity_id in by_id else {'_id': entity_id, 'found': False}
+            for entity_id in entity_ids
+        ]
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        raise NotImplementedError()
+
+    async def close_point_in_time(self, pit_id: str) -> None:
+        raise NotImplementedError()
+
+    async def close(self, **kwargs) -> None:
+        pass
+
+
+FILMS = [
+    {
+        'id': str(i),
+        'title': f'The Star {i}',
+        'imdb_rating': float(i),
+        'genre': ['Action'],
+        'director': ['Stan'],
+        'actors': [{'id': f'person-{i}', 'name': f'Actor {i}'}],
+        'writers': [],
+    }
+    for i in range(5)
+]
+PERSONS = [
+    {'id': f'person-{i}', 'name': f'Actor {i}', 'role': 'actor', 'film_ids': str(i)}
+    for i in range(5)
+]
+
+
+@pytest.fixture
+def cache_storage() -> DictCacheStorage:
+    return DictCacheStorage()
+
+
+@pytest.fixture
+def search_engine() -> StubSearchEngine:
+    # тесты могут менять документы
+    docs = copy.deepcopy({'movies': FILMS, 'person': PERSONS})
+    return StubSearchEngine(docs)
@@ -0,0 +1,57 @@
+from http import HTTPStatus
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import HTTPException
+
+from src.auth import TokenVerifier
+from src.core.constants import AUTH_UNAVAILABLE_MESS
+
+
+async def verify_with_status(cache_storage, status: int) -> bool:
+    """Проверка токена сервисом авторизации, который отвечает status"""
+
+    async def verify_token(request: web.Request) -> web.Response:
+        return web.json_response(True, status=status)
+
+    app = web.Application()
+    app.router.add_get('/verify_token', verify_token)
+    async with TestServer(app) as server:
+        async with aiohttp.ClientSession() as session:
+            verifier = TokenVerifier(
+                session=session,
+                cache=cache_storage,
+                url=str(server.make_url('/verify_token')),
+                cache_expire=60,
+                local_cache_size=10,
+            )
+            return await verifier.verify('access', None)
+
+
+@pytest.mark.asyncio
+async def test_valid_token(cache_storage):
+    assert await verify_with_status(cache_storage, HTTPStatus.OK)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('status', [
+    HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN
+])
+async def test_rejected_token(cache_storage, status):
+    assert not await verify_with_status(cache_storage, status)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('status', [
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.NOT_FOUND,
+])
+async def test_auth_service_failure(cache_storage, status):
+    with pytest.raises(HTTPException) as error:
+        await verify_with_status(cache_storage, status)
+
+    assert error.value.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert error.value.detail == AUTH_UNAVAILABLE_MESS
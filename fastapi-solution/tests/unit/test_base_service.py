@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from src.services.film import FilmService
+
+FIELDS = ('id', 'title')
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_make_one_request(cache_storage, search_engine):
+    film_service = FilmService(cache_storage, search_engine)
+
+    films = await asyncio.gather(*(
+        film_service.get_by_id('1', FIELDS) for _ in range(10)
+    ))
+
+    assert search_engine.gets == 1
+    assert {film.title for film in films} == {'The Star 1'}
+    assert film_service.stats()['coalesced'] == 9
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_refreshed_once(cache_storage, search_engine):
+    film_service = FilmService(cache_storage, search_engine)
+    # запись устаревает сразу, но живёт в кеше cache_stale секунд
+    film_service.cache_expire = 0
+    await film_service.get_by_id('1', FIELDS)
+    del film_service.cache_expire
+    search_engine.docs['movies'][1]['title'] = 'The Star 1 renamed'
+
+    films = await asyncio.gather(*(
+        film_service.get_by_id('1', FIELDS) for _ in range(10)
+    ))
+
+    assert {film.title for film in films} == {'The Star 1'}
+    assert film_service.stale_hits == 10
+    assert film_service.refreshes == 1
+
+    await asyncio.sleep(search_engine.delay * 5)
+    film = await film_service.get_by_id('1', FIELDS)
+    assert film.title == 'The Star 1 renamed'
+    assert search_engine.gets == 2
+    assert film_service.refreshes == 1
+
+
+@pytest.mark.asyncio
+async def test_raw_and_model_reads_do_not_share_fetch(
+    cache_storage, search_engine
+):
+    film_service = FilmService(cache_storage, search_engine)
+    fields = ('id', 'title', 'actors')
+
+    raw, film = await asyncio.gather(
+        film_service.get_raw_by_id('1', fields),
+        film_service.get_by_id('1', fields),
+    )
+
+    assert isinstance(raw, bytes)
+    assert film.dict()['actors'] == [{'id': 'person-1', 'name': 'Actor 1'}]
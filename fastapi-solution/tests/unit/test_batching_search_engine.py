@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+from elasticsearch import NotFoundError, RequestError
+
+from src.db.batching_search_engine import BatchingSearchEngine
+from tests.unit.conftest import StubSearchEngine
+
+WINDOW = 0.01
+
+
+class RecordingSearchEngine(StubSearchEngine):
+    """Отвечает телом запроса, по {'fail': status} - ошибкой этого поиска"""
+
+    def __init__(self) -> None:
+        super().__init__({}, delay=0)
+        self.calls = []
+        self.broken = False
+
+    async def search(self, index: str, body: dict, **kwargs) -> dict:
+        self.calls.append(('search', [body]))
+        if 'fail' in body:
+            raise RequestError(body['fail'], 'parsing_exception', {})
+        return {'index': index, 'body': body}
+
+    async def search_many(self, searches, **kwargs) -> list:
+        self.calls.append(('search_many', [body for _, body in searches]))
+        if self.broken:
+            raise ConnectionError('elastic is down')
+        return [
+            NotFoundError(404, 'index_not_found_exception', {})
+            if 'fail' in body else {'index': index, 'body': body}
+            for index, body in searches
+        ]
+
+
+@pytest.fixture
+def engine() -> RecordingSearchEngine:
+    return RecordingSearchEngine()
+
+
+@pytest.mark.asyncio
+async def test_searches_wait_for_window(engine):
+    batching = BatchingSearchEngine(engine, window=WINDOW, max_batch=10)
+
+    tasks = [
+        asyncio.ensure_future(batching.search('movies', {'n': n}))
+        for n in range(3)
+    ]
+    await asyncio.sleep(0)
+    assert engine.calls == []
+
+    results = await asyncio.gather(*tasks)
+
+    assert engine.calls == [('search_many', [{'n': 0}, {'n': 1}, {'n': 2}])]
+    assert [result['body'] for result in results] == [
+        {'n': 0}, {'n': 1}, {'n': 2}
+    ]
+    assert batching.stats() == {
+        'searches': 3, 'batches': 1, 'batched': 3, 'largest': 3
+    }
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_without_waiting(engine):
+    batching = BatchingSearchEngine(engine, window=10, max_batch=2)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*(
+            batching.search('movies', {'n': n}) for n in range(4)
+        )),
+        timeout=1
+    )
+
+    assert engine.calls == [
+        ('search_many', [{'n': 0}, {'n': 1}]),
+        ('search_many', [{'n': 2}, {'n': 3}]),
+    ]
+    assert [result['body']['n'] for result in results] == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_single_search_is_sent_as_is(engine):
+    batching = BatchingSearchEngine(engine, window=WINDOW, max_batch=2)
+
+    results = await asyncio.gather(*(
+        batching.search('movies', {'n': n}) for n in range(3)
+    ))
+
+    # третьему поиску пары не нашлось, окно закончилось
+    assert engine.calls == [
+        ('search_many', [{'n': 0}, {'n': 1}]),
+        ('search', [{'n': 2}]),
+    ]
+    assert [result['body']['n'] for result in results] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_only_their_search(engine):
+    batching = BatchingSearchEngine(engine, window=WINDOW, max_batch=10)
+
+    results = await asyncio.gather(
+        batching.search('movies', {'n': 0}),
+        batching.search('movies', {'n': 1, 'fail': 404}),
+        batching.search('person', {'n': 2}),
+        return_exceptions=True
+    )
+
+    assert results[0] == {'index': 'movies', 'body': {'n': 0}}
+    assert isinstance(results[1], NotFoundError)
+    assert results[2] == {'index': 'person', 'body': {'n': 2}}
+
+
+@pytest.mark.asyncio
+async def test_request_error_reaches_every_search(engine):
+    batching = BatchingSearchEngine(engine, window=WINDOW, max_batch=10)
+    engine.broken = True
+
+    results = await asyncio.gather(
+        *(batching.search('movies', {'n': n}) for n in range(3)),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_single_search_error(engine):
+    batching = BatchingSearchEngine(engine, window=WINDOW, max_batch=10)
+
+    with pytest.raises(RequestError):
+        await batching.search('movies', {'fail': 400})
+
+
+@pytest.mark.asyncio
+async def test_snapshot_and_extra_params_bypass_batching(engine):
+    batching = BatchingSearchEngine(engine, window=10, max_batch=10)
+
+    await asyncio.wait_for(
+        asyncio.gather(
+            batching.search(None, {'pit': {'id': 'snapshot'}}),
+            batching.search('movies', {'n': 0}, request_timeout=1),
+        ),
+        timeout=1
+    )
+
+    assert engine.calls == [
+        ('search', [{'pit': {'id': 'snapshot'}}]),
+        ('search', [{'n': 0}]),
+    ]
+    assert batching.stats()['searches'] == 0
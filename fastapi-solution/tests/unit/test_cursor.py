@@ -0,0 +1,40 @@
+import pytest
+
+from src.services.utils import decode_cursor, encode_cursor
+
+FILM_SORTS = ('imdb_rating', 'title')
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor('-imdb_rating', [7.5, 'film-1'], 3)
+
+    assert decode_cursor(cursor, FILM_SORTS) == {
+        'sort': '-imdb_rating',
+        'after': [7.5, 'film-1'],
+        'page': 3,
+    }
+
+
+@pytest.mark.parametrize('sort, after', [
+    ('description', [1, 'film-1']),
+    ('--imdb_rating', [1, 'film-1']),
+    ('imdb_rating', [1]),
+    ('imdb_rating', [1, 'film-1', 2]),
+    ('imdb_rating', [{'gt': 1}, 'film-1']),
+    ('imdb_rating', [1, None]),
+    ('imdb_rating', [True, 'film-1']),
+])
+def test_cursor_rejects_foreign_sort_and_after(sort, after):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(sort, after, 1), FILM_SORTS)
+
+
+def test_cursor_id_sort_has_one_value():
+    assert decode_cursor(encode_cursor('-id', ['person-1'], 1), ('id',))
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor('id', [1, 'person-1'], 1), ('id',))
+
+
+def test_cursor_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_cursor('garbage!', FILM_SORTS)
@@ -0,0 +1,26 @@
+import pytest
+
+from src.api.v1.films import films_to_dicts
+from src.db.local_cache_storage import LocalCacheStorage
+from src.services.film import FilmService
+from src.services.person import PersonService
+
+
+@pytest.mark.asyncio
+async def test_expand_keeps_cached_records(cache_storage, search_engine):
+    # записи из локального кеша общие для всех запросов воркера
+    cache = LocalCacheStorage(cache_storage, max_entries=100, max_bytes=10 ** 6)
+    film_service = FilmService(cache, search_engine)
+    person_service = PersonService(cache, search_engine)
+    fields = ('id', 'title', 'actors')
+    await film_service.get_by_ids(['1'], fields)
+
+    [film] = await film_service.get_by_ids(['1'], fields)
+    [expanded] = await films_to_dicts([film], ('actors',), person_service)
+    assert expanded['actors'] == [{
+        'id': 'person-1', 'name': 'Actor 1', 'role': 'actor', 'film_ids': '1'
+    }]
+
+    [film] = await film_service.get_by_ids(['1'], fields)
+    [plain] = await films_to_dicts([film], (), person_service)
+    assert plain['actors'] == [{'id': 'person-1', 'name': 'Actor 1'}]
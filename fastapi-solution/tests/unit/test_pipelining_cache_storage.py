@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from src.db.async_cache_storage import RedisCacheStorage
+from src.db.local_cache_storage import LocalCacheStorage
+from src.db.pipelining_cache_storage import PipeliningCacheStorage
+
+
+class StubPipeline:
+    """Пайплайн, который записывает команды и отвечает из dict"""
+
+    def __init__(self, redis: 'StubRedis') -> None:
+        self._redis = redis
+        self._commands = []
+
+    def mget(self, *keys):
+        self._commands.append(('mget', keys))
+
+    def pttl(self, key):
+        self._commands.append(('pttl', key))
+
+    def set(self, key, value, expire=0):
+        self._commands.append(('set', key, value))
+
+    async def execute(self, return_exceptions=False):
+        self._redis.executed.append([command[0] for command in self._commands])
+        await asyncio.sleep(0)
+        results = []
+        for command, *args in self._commands:
+            if command == 'mget':
+                results.append([self._redis.data.get(key) for key in args[0]])
+            elif command == 'pttl':
+                results.append(self._redis.ttls.get(args[0], -2))
+            else:
+                self._redis.data[args[0]] = args[1]
+                results.append(True)
+        return results
+
+
+class StubRedis(RedisCacheStorage):
+    def __init__(self) -> None:
+        self.data = {'film': b'1', 'person': b'2'}
+        self.ttls = {'film': 1500, 'person': -1}
+        self.executed = []
+
+    def pipeline(self):
+        return StubPipeline(self)
+
+
+@pytest.mark.asyncio
+async def test_ttl_reads_share_one_pipeline():
+    redis = StubRedis()
+    storage = PipeliningCacheStorage(redis, max_batch=100)
+
+    results = await asyncio.gather(
+        storage.get_with_ttl('film'),
+        storage.get_many_with_ttl(['person', 'missing']),
+        storage.get('film'),
+        storage.set('new', b'3', expire=10),
+    )
+
+    assert results == [
+        (b'1', 1.5),
+        [(b'2', None), (None, None)],
+        b'1',
+        None,
+    ]
+    assert redis.executed == [['mget', 'pttl', 'pttl', 'pttl', 'set']]
+
+
+@pytest.mark.asyncio
+async def test_local_cache_misses_make_one_round_trip():
+    redis = StubRedis()
+    cache = LocalCacheStorage(
+        PipeliningCacheStorage(redis, max_batch=100),
+        max_entries=100,
+        max_bytes=10 ** 6
+    )
+
+    results = await asyncio.gather(*(
+        cache.get(key) for key in ('film', 'person', 'film', 'missing')
+    ))
+
+    assert results == [b'1', b'2', b'1', None]
+    assert len(redis.executed) == 1
+
+
+class StubTransaction(StubPipeline):
+    def smembers(self, key, encoding=None):
+        self._commands.append(('smembers', key))
+
+    def delete(self, *keys):
+        self._commands.append(('delete', keys))
+
+    async def execute(self, return_exceptions=False):
+        self._redis.executed.append([command[0] for command in self._commands])
+        results = []
+        for command, *args in self._commands:
+            if command == 'smembers':
+                results.append(self._redis.tags.get(args[0], set()))
+            else:
+                for key in args[0]:
+                    self._redis.tags.pop(key, None)
+                results.append(len(args[0]))
+        return results
+
+
+class TaggedStubRedis(StubRedis):
+    def __init__(self) -> None:
+        super().__init__()
+        self.tags = {'tag:film': {'film'}, 'tag:search': {'film', 'page'}}
+        self.deleted = []
+
+    def multi_exec(self):
+        return StubTransaction(self)
+
+    async def delete(self, *keys):
+        self.executed.append(['delete'])
+        self.deleted.extend(keys)
+
+
+@pytest.mark.asyncio
+async def test_pop_tagged_drops_tags_in_one_transaction():
+    redis = TaggedStubRedis()
+
+    keys = await redis.pop_tagged(['tag:film', 'tag:search'])
+
+    assert keys == ['film', 'page']
+    assert redis.executed == [['smembers', 'smembers', 'delete'], ['delete']]
+    assert redis.tags == {}
+    assert redis.deleted == ['film', 'page']